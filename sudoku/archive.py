@@ -0,0 +1,146 @@
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from .grid import Grid, grid_from_puzzle, grid_to_puzzle, is_grid
+from .types import Cage, Game, Puzzle
+
+# Layout: magic, version, header length, header (JSON with the rules and
+# cages shared by every game of the archive), then one record per grid:
+# 81 cells as 4 bit nibbles, high nibble first, the last one padding.
+# Record i starts at data_offset + i * RECORD_SIZE.
+ARCHIVE_MAGIC = b"SDKA"
+ARCHIVE_VERSION = 1
+PREFIX = struct.Struct("<4sBI")
+RECORD_SIZE = 41
+
+HIGH_NIBBLE = bytes(value >> 4 for value in range(256))
+LOW_NIBBLE = bytes(value & 0xF for value in range(256))
+
+
+def pack_grid(grid: Grid) -> bytes:
+    cells = bytes(grid) + b"\0"
+    return bytes(high << 4 | low for high, low in zip(cells[0::2], cells[1::2]))
+
+
+def unpack_grid(record: bytes) -> Grid:
+    cells = bytearray(RECORD_SIZE * 2)
+    cells[0::2] = record.translate(HIGH_NIBBLE)
+    cells[1::2] = record.translate(LOW_NIBBLE)
+    del cells[81:]
+    if max(cells) > 9:
+        raise ValueError("Archive record has a cell above 9")
+    return cells
+
+
+def solutions_path(path: Path) -> Path:
+    # puzzles.sdka -> puzzles.solutions.sdka, record i solves puzzle i
+    return path.with_name(f"{path.stem}.solutions{path.suffix}")
+
+
+def is_archive(path: Path) -> bool:
+    if not path.is_file():
+        return False
+    with open(path, "rb") as f:
+        return f.read(len(ARCHIVE_MAGIC)) == ARCHIVE_MAGIC
+
+
+class ArchiveWriter:
+    # Writes records at the end, or at their index with put (for the
+    # solutions file, whose records line up with the puzzles)
+    def __init__(self, path: Path, rules: List[str], cages: List[Cage]):
+        cages = [[tuple(cell) for cell in cage] for cage in cages]
+        header = json.dumps({"rules": rules, "cages": cages}).encode()
+        exists = path.exists() and path.stat().st_size > 0
+        self.file = open(path, "r+b" if exists else "w+b")
+        if exists:
+            archive_header = read_header(self.file)
+            if archive_header[:2] != (rules, cages):
+                raise ValueError(f"{path} holds games with other rules or cages")
+            self.data_offset = archive_header[2]
+        else:
+            self.file.write(PREFIX.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION,
+                                        len(header)))
+            self.file.write(header)
+            self.data_offset = PREFIX.size + len(header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def append(self, puzzle: Puzzle):
+        self.file.seek(0, os.SEEK_END)
+        self.file.write(pack_grid(puzzle if is_grid(puzzle) else grid_from_puzzle(puzzle)))
+
+    def put(self, index: int, puzzle: Puzzle):
+        # Records before the index that were never written read as empty
+        self.file.seek(self.data_offset + index * RECORD_SIZE)
+        self.file.write(pack_grid(puzzle if is_grid(puzzle) else grid_from_puzzle(puzzle)))
+
+    def close(self):
+        self.file.close()
+
+
+def read_header(f) -> Tuple[List[str], List[Cage], int]:
+    f.seek(0)
+    magic, version, length = PREFIX.unpack(f.read(PREFIX.size))
+    if magic != ARCHIVE_MAGIC:
+        raise ValueError("Not a puzzle archive")
+    if version != ARCHIVE_VERSION:
+        raise ValueError(f"Unknown archive version: {version}")
+    header = json.loads(f.read(length))
+    cages = [[tuple(cell) for cell in cage] for cage in header["cages"]]
+    return header["rules"], cages, PREFIX.size + length
+
+
+class Archive:
+    # Read only view of an archive: puzzle i is one slice of the mapped
+    # file, nothing before it is read
+    def __init__(self, path: Path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.rules, self.cages, self.data_offset = read_header(self.file)
+        size = os.fstat(self.file.fileno()).st_size
+        self.count = (size - self.data_offset) // RECORD_SIZE
+        self.mm = None
+        if self.count > 0:
+            self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> Grid:
+        if not 0 <= index < self.count:
+            raise IndexError(f"Archive has {self.count} records")
+        offset = self.data_offset + index * RECORD_SIZE
+        return unpack_grid(self.mm[offset:offset + RECORD_SIZE])
+
+    def game(self, index: int) -> Game:
+        return Game(grid_to_puzzle(self[index]), self.cages, self.rules)
+
+    def record_range(self, start: int = 0, end: Optional[int] = None) -> range:
+        # Records starting in the byte range [start, end), see byte_ranges
+        end = self.data_offset + self.count * RECORD_SIZE if end is None else end
+        first = max(0, -(-(start - self.data_offset) // RECORD_SIZE))
+        last = max(0, -(-(end - self.data_offset) // RECORD_SIZE))
+        return range(min(first, self.count), min(last, self.count))
+
+    def __iter__(self) -> Iterator[Grid]:
+        for index in range(self.count):
+            yield self[index]
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+        self.file.close()
@@ -0,0 +1,281 @@
+import concurrent.futures
+import itertools
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional, Tuple, Union
+
+from .archive import Archive, is_archive
+from .budget import BUDGET_EXHAUSTED, SOLVED, BudgetExhausted
+from .config import (SolverConfig, count_solutions, make_budget,
+                     solve_game_result)
+from .grid import grid_to_puzzle
+from .helpers import check_puzzle_is_valid, game_from_file, puzzle_to_line
+from .metrics import Metrics
+from .reader import iter_puzzle_lines
+from .store import SolutionStore, StoredSolution, game_key
+from .symmetry import SolutionCache
+from .types import Game
+
+BatchItem = Tuple[str, Optional[Game]]
+BatchResult = Tuple[str, str, int, float, str]
+
+
+class Answered(NamedTuple):
+    # An item answered before reaching the workers, see solve_batch
+    result: BatchResult
+
+
+# Puzzles looked up or stored per query
+STORE_CHUNK = 512
+
+GIVENS_ERROR = "the givens break the normal rules"
+
+# Per process state, set by init_batch_worker
+worker_config: Optional[SolverConfig] = None
+worker_func: Optional[Callable[[SolverConfig, BatchItem], BatchResult]] = None
+worker_cache: Optional[SolutionCache] = None
+
+
+def is_lines_file(path: Path, input_format: str = "auto") -> bool:
+    # One puzzle per line, as opposed to a single puzzle file. Told by the
+    # suffix, not the content, unless the format is given: .csv files
+    # hold one puzzle, any other file one per line.
+    if input_format != "auto":
+        return input_format == "lines"
+    return path.suffix != ".csv"
+
+
+def invalid_item(name: str, error: str) -> Answered:
+    # Reported as invalid instead of stopping the batch, with the error in
+    # place of the solution
+    return Answered((name, "invalid", 0, 0.0, error))
+
+
+def read_game_file(file_path: Path) -> Union[BatchItem, Answered]:
+    try:
+        return str(file_path), game_from_file(file_path)
+    except (ValueError, IndexError) as e:
+        return invalid_item(str(file_path), str(e) or "unreadable puzzle file")
+
+
+def is_sliceable_input(path: Path, input_format: str = "auto") -> bool:
+    # Inputs the byte range, skip and limit of iter_batch_games apply to
+    return not path.is_dir() and (is_archive(path) or
+                                  is_lines_file(path, input_format))
+
+
+def iter_batch_games(path: Path, start: int = 0, end: Optional[int] = None,
+                     skip: int = 0, limit: Optional[int] = None,
+                     input_format: str = "auto") -> Iterator[Union[BatchItem, Answered]]:
+    # A directory of .csv/.txt puzzle files, a single puzzle file, a file
+    # with one puzzle per line (81 cells, '0' or '.' for blanks) or an
+    # archive (see archive.py). The byte range, skip and limit apply
+    # to files of lines and archives, see iter_puzzle_lines. Puzzles that
+    # can not be read come as invalid_item answers.
+    if (start, end, skip, limit) != (0, None, 0, None) and \
+            not is_sliceable_input(path, input_format):
+        raise ValueError(f"{path} is not a file of lines or an archive, "
+                         "it can not be sharded or sliced")
+    if path.is_dir():
+        for file_path in sorted(path.iterdir()):
+            if file_path.suffix in [".csv", ".txt"]:
+                yield read_game_file(file_path)
+    elif is_archive(path):
+        with Archive(path) as archive:
+            records = archive.record_range(start, end)
+            stop = None if limit is None else skip + limit
+            for index in itertools.islice(records, skip, stop):
+                name = f"{path}#{index}"
+                try:
+                    game = archive.game(index)
+                except ValueError as e:
+                    yield invalid_item(name, str(e))
+                    continue
+                yield name, game
+    elif not is_lines_file(path, input_format):
+        yield read_game_file(path)
+    else:
+        for line in iter_puzzle_lines(path, start, end, skip, limit):
+            if line.number is not None:
+                name = f"{path}:{line.number}"
+            else:
+                name = f"{path}@{line.offset}"
+            if line.grid is None:
+                yield invalid_item(name, line.error)
+                continue
+            yield name, Game(grid_to_puzzle(line.grid), [], ["normal rules"])
+
+
+def solve_batch_item(config: SolverConfig, item: BatchItem) -> BatchResult:
+    name, game = item
+    if game is None:
+        return name, "invalid", 0, 0.0, ""
+    if not check_puzzle_is_valid(game.puzzle):
+        # The searches assume the givens follow the rules
+        return name, "invalid", 0, 0.0, GIVENS_ERROR
+
+    start_time = time.perf_counter()
+    result = solve_game_result(config, game, cache=worker_cache)
+    duration = time.perf_counter() - start_time
+
+    nodes = result.metrics.nodes()
+    if result.status == SOLVED:
+        return name, "solved", nodes, duration, puzzle_to_line(result.solution)
+    if result.reason == "max_frontier":
+        return name, "frontier_full", nodes, duration, ""
+    return name, result.status, nodes, duration, ""
+
+
+def count_batch_item(config: SolverConfig, item: BatchItem,
+                     limit: int = 2) -> BatchResult:
+    # Status is none, unique or multiple, the witnesses are comma separated
+    name, game = item
+    if game is None:
+        return name, "invalid", 0, 0.0, ""
+    if not check_puzzle_is_valid(game.puzzle):
+        return name, "invalid", 0, 0.0, GIVENS_ERROR
+
+    metrics = Metrics()
+    start_time = time.perf_counter()
+    try:
+        solutions = count_solutions(config, game, metrics, limit,
+                                    make_budget(config))
+    except BudgetExhausted:
+        duration = time.perf_counter() - start_time
+        return name, BUDGET_EXHAUSTED, metrics.nodes(), duration, ""
+    duration = time.perf_counter() - start_time
+
+    if len(solutions) == 0:
+        status = "none"
+    elif len(solutions) == 1:
+        status = "unique" if limit > 1 else "solved"
+    else:
+        status = "multiple"
+    witnesses = ",".join(puzzle_to_line(solution) for solution in solutions)
+    return name, status, metrics.nodes(), duration, witnesses
+
+
+def init_batch_worker(config: SolverConfig, func):
+    global worker_config, worker_func, worker_cache
+    worker_config = config
+    worker_func = func
+    if config.symmetry_cache is not None:
+        # One per worker, copies sent to different workers are solved by each
+        worker_cache = SolutionCache(config.symmetry_cache)
+
+
+def solve_batch_worker(item: BatchItem) -> BatchResult:
+    return worker_func(worker_config, item)
+
+
+def solve_batch(config: SolverConfig,
+                items: Iterable[Union[BatchItem, Answered]],
+                workers: int, ordered: bool = True,
+                window: int = 64,
+                func=solve_batch_item) -> Iterator[BatchResult]:
+    # Keeps at most `window` puzzles per worker in flight, so the input is
+    # streamed instead of loaded up front. func is run on each item in the
+    # workers, it has to be picklable. Answered items take their place
+    # in the window and the output without going to the workers.
+    with concurrent.futures.ProcessPoolExecutor(
+            workers,
+            initializer=init_batch_worker, initargs=(config, func)) as executor:
+        items = iter(items)
+        limit = workers * window
+        pending = deque()
+        running = set()
+        exhausted = False
+        while True:
+            while not exhausted and len(running) < limit:
+                item = next(items, None)
+                if item is None:
+                    exhausted = True
+                    break
+                if isinstance(item, Answered):
+                    future = concurrent.futures.Future()
+                    future.set_result(item.result)
+                else:
+                    future = executor.submit(solve_batch_worker, item)
+                if ordered:
+                    pending.append(future)
+                running.add(future)
+
+            if len(running) == 0:
+                return
+
+            if ordered:
+                future = pending.popleft()
+                running.discard(future)
+                yield future.result()
+            else:
+                done, running = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+
+def solve_batch_stored(config: SolverConfig,
+                       items: Iterable[Union[BatchItem, Answered]],
+                       workers: int, store: SolutionStore,
+                       ordered: bool = True,
+                       solve=solve_batch) -> Iterator[BatchResult]:
+    # Puzzles already in the store are answered from it with status
+    # "cached", the stored nodes and duration, one lookup per chunk of the
+    # input, answered items pass on in their place. The rest go to solve
+    # (solve_batch or solve_batch_vectorized) and their solutions are
+    # stored.
+    # In input order, None stands for a puzzle sent to the workers
+    queue = deque()
+    keys = {}
+
+    def unknown_items():
+        items_iter = iter(items)
+        while True:
+            chunk = list(itertools.islice(items_iter, STORE_CHUNK))
+            if len(chunk) == 0:
+                return
+            chunk_keys = {}
+            for item in chunk:
+                if not isinstance(item, Answered) and item[1] is not None:
+                    chunk_keys[item[0]] = game_key(item[1])
+            found = store.get_many(chunk_keys.values())
+            for item in chunk:
+                if isinstance(item, Answered):
+                    queue.append(item.result)
+                    continue
+                name, game = item
+                stored = found.get(chunk_keys.get(name))
+                if stored is not None:
+                    queue.append((name, "cached", stored.nodes,
+                                  stored.duration, stored.solution))
+                    continue
+                if ordered:
+                    queue.append(None)
+                if game is not None:
+                    keys[name] = chunk_keys[name]
+                yield name, game
+
+    solved = []
+    for result in solve(config, unknown_items(), workers, ordered):
+        while len(queue) > 0 and queue[0] is not None:
+            yield queue.popleft()
+        if ordered:
+            queue.popleft()
+        yield result
+
+        name, status, nodes, duration, solution = result
+        key = keys.pop(name, None)
+        if status == "solved" and key is not None:
+            solved.append((key, StoredSolution(solution, nodes, duration)))
+        if len(solved) >= STORE_CHUNK:
+            store.put_many(solved)
+            solved = []
+
+    yield from queue
+    store.put_many(solved)
+
+
+def format_batch_result(result: BatchResult) -> str:
+    name, status, nodes, duration, solution = result
+    return f"{name}\t{status}\t{nodes}\t{duration:.6f}\t{solution}"
@@ -0,0 +1,150 @@
+import itertools
+import json
+import statistics
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from .config import SolverConfig, solve_game
+from .helpers import check_puzzle_is_complete, game_from_file
+from .metrics import Metrics
+from .types import Game
+
+BenchKey = Tuple[str, str, str, str, str]
+
+
+@dataclass
+class BenchCase:
+    puzzle: str
+    solver_version: str
+    solve_type: str
+    next_step: str
+    collect_next_steps: str
+
+    def key(self) -> BenchKey:
+        return (self.puzzle, self.solver_version, self.solve_type,
+                self.next_step, self.collect_next_steps)
+
+    def config(self) -> SolverConfig:
+        return SolverConfig(self.next_step, self.collect_next_steps,
+                            solve_type=self.solve_type,
+                            solver_version=self.solver_version)
+
+
+def bench_puzzles(path: Path) -> List[Path]:
+    # Solution files are complete grids, nothing to benchmark there
+    if not path.is_dir():
+        return [path]
+    return [file_path for file_path in sorted(path.iterdir())
+            if file_path.suffix in [".csv", ".txt"]
+            and "solution" not in file_path.stem]
+
+
+def bench_matrix(puzzles: Sequence[Path],
+                 solver_versions: Sequence[str],
+                 solve_types: Sequence[str],
+                 next_steps: Sequence[str],
+                 collect_next_steps: Sequence[str]) -> List[BenchCase]:
+    cases = []
+    for puzzle in puzzles:
+        for solver_version in solver_versions:
+            if solver_version == "dlx":
+                # The other options do not apply to dancing links
+                cases.append(BenchCase(str(puzzle), "dlx", "-", "-", "-"))
+                continue
+            for solve_type, next_step, collect in itertools.product(
+                    solve_types, next_steps, collect_next_steps):
+                cases.append(BenchCase(str(puzzle), solver_version,
+                                       solve_type, next_step, collect))
+    return cases
+
+
+def bench_once(config: SolverConfig, game: Game):
+    metrics = Metrics()
+    start_time = time.perf_counter()
+    solution = solve_game(config, game, metrics)
+    duration = time.perf_counter() - start_time
+    solved = solution is not None and check_puzzle_is_complete(solution)
+    return metrics.nodes(), duration, solved
+
+
+def run_case(case: BenchCase, repeats: int, warmup: int) -> dict:
+    config = case.config()
+    game = game_from_file(Path(case.puzzle))
+
+    for _ in range(warmup):
+        bench_once(config, game)
+
+    times = []
+    for _ in range(repeats):
+        nodes, duration, solved = bench_once(config, game)
+        times.append(duration)
+
+    # Separate run, tracing allocations slows the solver down
+    tracemalloc.start()
+    bench_once(config, game)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(times)
+    result = asdict(case)
+    result.update({
+        "solved": solved,
+        "nodes": nodes,
+        "times": times,
+        "best": best,
+        "median": statistics.median(times),
+        "nodes_per_sec": nodes / best if best > 0 else 0.0,
+        "peak_memory": peak_memory,
+    })
+    return result
+
+
+def run_bench(cases: Iterable[BenchCase], repeats: int,
+              warmup: int) -> Iterable[dict]:
+    for case in cases:
+        yield run_case(case, repeats, warmup)
+
+
+def result_key(result: dict) -> BenchKey:
+    return (result["puzzle"], result["solver_version"], result["solve_type"],
+            result["next_step"], result["collect_next_steps"])
+
+
+def load_results(path: Path) -> Dict[BenchKey, dict]:
+    with open(path) as f:
+        return {result_key(result): result for result in json.load(f)}
+
+
+def save_results(path: Path, results: List[dict]):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def compare_results(results: List[dict], baseline: Dict[BenchKey, dict],
+                    max_slowdown: float) -> List[str]:
+    # Compares best times, the least noisy of the repeats
+    regressions = []
+    for result in results:
+        base = baseline.get(result_key(result))
+        if base is None or base["best"] <= 0:
+            continue
+        name = " ".join(result_key(result))
+        slowdown = result["best"] / base["best"] - 1
+        if slowdown > max_slowdown:
+            regressions.append(
+                f"{name}: {base['best']:.6f}s -> {result['best']:.6f}s "
+                f"({slowdown:+.1%})")
+        if result["nodes"] != base["nodes"]:
+            regressions.append(
+                f"{name}: nodes {base['nodes']} -> {result['nodes']}")
+    return regressions
+
+
+def format_bench_result(result: dict) -> str:
+    name = " ".join(result_key(result))
+    status = "solved" if result["solved"] else "unsolved"
+    return (f"{name}\t{status}\t{result['nodes']}\t{result['best']:.6f}\t"
+            f"{result['nodes_per_sec']:.0f}\t{result['peak_memory']}")
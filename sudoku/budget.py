@@ -0,0 +1,95 @@
+import threading
+from time import perf_counter
+from typing import NamedTuple, Optional
+
+from .metrics import Metrics
+from .types import Puzzle
+
+SOLVED = "solved"
+UNSOLVABLE = "unsolvable"
+BUDGET_EXHAUSTED = "budget_exhausted"
+
+# Nodes between two looks at the clock and the cancel token
+BUDGET_CHECK_NODES = 256
+
+
+class BudgetExhausted(Exception):
+    def __init__(self, reason: str):
+        super().__init__(f"Budget exhausted: {reason}")
+        # max_nodes, timeout, cancelled (or max_frontier, see SolveResult)
+        self.reason = reason
+
+
+class CancelToken:
+    # Set from another thread (or a signal handler) to stop a search at
+    # its next budget check. Anything with is_set() works as a token, a
+    # multiprocessing Event reaches searches in other processes.
+    def __init__(self):
+        self.event = threading.Event()
+
+    def cancel(self):
+        self.event.set()
+
+    def is_set(self) -> bool:
+        return self.event.is_set()
+
+
+class Budget:
+    # Limits a search to max_nodes nodes, timeout seconds from its creation
+    # and until cancel is set. check() is called once per node, the clock
+    # and the token are only looked at every BUDGET_CHECK_NODES nodes.
+    def __init__(self, max_nodes: Optional[int] = None,
+                 timeout: Optional[float] = None, cancel=None):
+        self.max_nodes = max_nodes
+        self.cancel = cancel
+        self.deadline = None if timeout is None else perf_counter() + timeout
+        # Nodes checked so far, not counting the ones since the last look
+        self.nodes = 0
+        self.step = 0
+        self.countdown = 0
+        self._reset()
+
+    def _reset(self):
+        self.step = BUDGET_CHECK_NODES
+        if self.max_nodes is not None:
+            self.step = min(self.step, self.max_nodes - self.nodes)
+        self.countdown = self.step
+
+    def check(self):
+        self.countdown -= 1
+        if self.countdown < 0:
+            self._check()
+
+    def _check(self):
+        # The nodes of the last step passed, this one is the next
+        self.nodes += self.step
+        reason = self.exhausted(self.nodes)
+        if reason is not None:
+            raise BudgetExhausted(reason)
+        self.nodes += 1
+        self._reset()
+
+    def exhausted(self, nodes: int) -> Optional[str]:
+        # Why a search that went through `nodes` nodes has to stop, if it does
+        if self.max_nodes is not None and nodes >= self.max_nodes:
+            return "max_nodes"
+        if self.cancel is not None and self.cancel.is_set():
+            return "cancelled"
+        if self.deadline is not None and perf_counter() >= self.deadline:
+            return "timeout"
+        return None
+
+    def remaining(self) -> Optional[float]:
+        # Seconds left before the timeout, None without one
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - perf_counter())
+
+
+class SolveResult(NamedTuple):
+    # status is SOLVED, UNSOLVABLE or BUDGET_EXHAUSTED, reason tells which
+    # budget ran out. The metrics hold the stats of the search so far.
+    status: str
+    solution: Optional[Puzzle]
+    reason: str
+    metrics: Metrics
@@ -0,0 +1,425 @@
+import functools
+from typing import Callable, List, Tuple
+
+from .grid import ADJACENT_CELLS, PEERS, Grid, grid_rows, is_grid
+from .helpers import (cage_assert, collect_block_indexes,
+                      compute_block_index)
+from .transposition import ZOBRIST_KEYS, zobrist_domains
+from .types import Cage, Coord, Game, Puzzle
+
+# Candidates are 9-bit masks: bit (d - 1) is set when digit d is allowed.
+ALL_DIGITS_MASK = 0b111111111
+
+# Indexed by cell value, so an empty cell (0) contributes nothing.
+DIGIT_MASK = [0] + [1 << (digit - 1) for digit in range(1, 10)]
+
+POPCOUNT = [bin(mask).count("1") for mask in range(1 << 9)]
+LOWEST_DIGIT = [0] + [(mask & -mask).bit_length()
+                      for mask in range(1, 1 << 9)]
+MASK_DIGITS = [tuple(digit for digit in range(1, 10) if mask & DIGIT_MASK[digit])
+               for mask in range(1 << 9)]
+
+# Digits forbidden next to a cell holding the value (no consecutive rule).
+CONSECUTIVE_MASK = [0] + [DIGIT_MASK[value - 1] | (DIGIT_MASK[value + 1] if value < 9 else 0)
+                          for value in range(1, 10)]
+
+BLOCK_INDEX = [[compute_block_index(i, j) for j in range(9)]
+               for i in range(9)]
+BLOCK_CELLS = [collect_block_indexes(block_ix) for block_ix in range(9)]
+UNITS = [tuple((i, j) for j in range(9)) for i in range(9)] + \
+    [tuple((i, j) for i in range(9)) for j in range(9)] + \
+    [tuple(cells) for cells in BLOCK_CELLS]
+ADJACENTS = [[tuple((i + di, j + dj)
+                    for di, dj in [(-1, 0), (1, 0), (0, -1), (0, 1)]
+                    if 0 <= i + di < 9 and 0 <= j + dj < 9)
+              for j in range(9)]
+             for i in range(9)]
+NO_CELLS = ((),) * 81
+
+
+@functools.lru_cache(maxsize=64)
+def constraint_tables(normal: bool, cages: Tuple[Tuple[Coord, ...], ...]):
+    # (units, units of each cell, peers of each cell) over flat cell
+    # indexes. Units are the groups of 9 cells that must hold every digit
+    # exactly once, peers the other cells that must hold a different one.
+    units = [tuple(i * 9 + j for i, j in unit) for unit in UNITS] if normal else []
+    units += [tuple(i * 9 + j for i, j in cage) for cage in cages if len(cage) == 9]
+    cell_units = [[] for _ in range(81)]
+    for unit_ix, unit in enumerate(units):
+        for cell in unit:
+            cell_units[cell].append(unit_ix)
+
+    if len(cages) == 0:
+        return units, cell_units, PEERS if normal else NO_CELLS
+    peers = [set(PEERS[cell]) if normal else set() for cell in range(81)]
+    for cage in cages:
+        cells = [i * 9 + j for i, j in cage]
+        for cell in cells:
+            peers[cell].update(cells)
+    return units, cell_units, tuple(tuple(sorted(cells - {cell}))
+                                    for cell, cells in enumerate(peers))
+
+
+def cages_key(cages: List[Cage]) -> Tuple[Tuple[Coord, ...], ...]:
+    return tuple(tuple((i, j) for i, j in cage) for cage in cages)
+
+
+def game_constraints(game: Game) -> Tuple[bool, List[Cage], bool, bool]:
+    normal = False
+    cages = []
+    no_consecutive = False
+    infeasible = False
+    for name in game.rules:
+        if name == "normal rules":
+            normal = True
+        elif name == "unique cages":
+            for cage in game.cages:
+                cage_assert(cage)
+                cages.append(cage)
+        elif name == "no consecutive digits in ortogonal adjacent":
+            no_consecutive = True
+        elif name == "infeasible":
+            infeasible = True
+        else:
+            raise ValueError(f"Unknown rule: {name}")
+    return normal, cages, no_consecutive, infeasible
+
+
+def options_mask(puzzle: Puzzle, row_ix: int, col_ix: int) -> int:
+    used = 0
+    for value in puzzle[row_ix]:
+        used |= DIGIT_MASK[value]
+    for row in puzzle:
+        used |= DIGIT_MASK[row[col_ix]]
+    for i, j in BLOCK_CELLS[BLOCK_INDEX[row_ix][col_ix]]:
+        used |= DIGIT_MASK[puzzle[i][j]]
+    return ~used & ALL_DIGITS_MASK
+
+
+def make_options_mask(game: Game) -> Callable[[Puzzle, int, int], int]:
+    normal, cages, no_consecutive, _infeasible = game_constraints(game)
+
+    cell_cages = [[[] for _ in range(9)] for _ in range(9)]
+    for cage in cages:
+        for i, j in cage:
+            cell_cages[i][j].append(cage)
+
+    def game_options_mask(puzzle: Puzzle, row_ix: int, col_ix: int) -> int:
+        if normal:
+            options = options_mask(puzzle, row_ix, col_ix)
+        else:
+            options = ALL_DIGITS_MASK
+        used = 0
+        for cage in cell_cages[row_ix][col_ix]:
+            for i, j in cage:
+                used |= DIGIT_MASK[puzzle[i][j]]
+        if no_consecutive:
+            for i, j in ADJACENTS[row_ix][col_ix]:
+                used |= CONSECUTIVE_MASK[puzzle[i][j]]
+        return options & ~used
+
+    return game_options_mask
+
+
+def grid_options_mask(grid: Grid, cell: int) -> int:
+    used = 0
+    for peer in PEERS[cell]:
+        used |= DIGIT_MASK[grid[peer]]
+    return ~used & ALL_DIGITS_MASK
+
+
+def make_grid_options_mask(game: Game) -> Callable[[Grid, int], int]:
+    normal, cages, no_consecutive, _infeasible = game_constraints(game)
+
+    # Every other cell whose value removes an option, per cell
+    cell_peers = constraint_tables(normal, cages_key(cages))[2]
+
+    def game_grid_options_mask(grid: Grid, cell: int) -> int:
+        used = 0
+        for peer in cell_peers[cell]:
+            used |= DIGIT_MASK[grid[peer]]
+        if no_consecutive:
+            for adjacent in ADJACENT_CELLS[cell]:
+                used |= CONSECUTIVE_MASK[grid[adjacent]]
+        return ~used & ALL_DIGITS_MASK
+
+    return game_grid_options_mask
+
+
+class Candidates:
+    def __init__(self, puzzle: Puzzle, normal: bool = True,
+                 cages: List[Cage] = (), no_consecutive: bool = False,
+                 track_domains: bool = False):
+        if is_grid(puzzle):
+            puzzle = grid_rows(puzzle)
+        self.puzzle = puzzle
+        self.normal = normal
+        self.no_consecutive = no_consecutive
+        self.rows = [0] * 9
+        self.cols = [0] * 9
+        self.blocks = [0] * 9
+        self.cages = [0] * len(cages)
+        self.trail = []
+        self.cell_cages = [[() for _ in range(9)] for _ in range(9)]
+        for cage_ix, cage in enumerate(cages):
+            for i, j in cage:
+                self.cell_cages[i][j] += (cage_ix,)
+
+        # Groups of 9 cells that must hold every digit exactly once
+        self.units = UNITS if normal else []
+        self.units = self.units + [tuple(cage) for cage in cages
+                                   if len(cage) == 9]
+
+        for i in range(9):
+            for j in range(9):
+                if puzzle[i][j] != 0:
+                    self._mark(i, j, DIGIT_MASK[puzzle[i][j]])
+
+        self.cages_cells = list(cages)
+        # Built on first use, see tracked_domains
+        self.track_domains = track_domains
+        self.domains = None
+
+    def _mark(self, row_ix: int, col_ix: int, bit: int):
+        self.rows[row_ix] |= bit
+        self.cols[col_ix] |= bit
+        self.blocks[BLOCK_INDEX[row_ix][col_ix]] |= bit
+        for cage_ix in self.cell_cages[row_ix][col_ix]:
+            self.cages[cage_ix] |= bit
+
+    def _unmark(self, row_ix: int, col_ix: int, bit: int):
+        self.rows[row_ix] &= ~bit
+        self.cols[col_ix] &= ~bit
+        self.blocks[BLOCK_INDEX[row_ix][col_ix]] &= ~bit
+        for cage_ix in self.cell_cages[row_ix][col_ix]:
+            self.cages[cage_ix] &= ~bit
+
+    def place(self, row_ix: int, col_ix: int, value: int):
+        self.puzzle[row_ix][col_ix] = value
+        self._mark(row_ix, col_ix, DIGIT_MASK[value])
+        if self.domains is not None:
+            self.domains.place(row_ix * 9 + col_ix, value)
+
+    def remove(self, row_ix: int, col_ix: int):
+        self._unmark(row_ix, col_ix, DIGIT_MASK[self.puzzle[row_ix][col_ix]])
+        self.puzzle[row_ix][col_ix] = 0
+        if self.domains is not None:
+            if not self.domains.unplace(row_ix * 9 + col_ix):
+                self.domains = type(self.domains)(self)
+
+    def tracked_domains(self):
+        # The searches on copies make a Candidates per node and most never
+        # ask, so the domains are only built from the grid when first read
+        # and kept up to date from then on
+        if self.domains is None and self.track_domains:
+            self.domains = Domains(self)
+        return self.domains
+
+    def infeasible(self) -> bool:
+        # Only tracked when the domains are, see Domains
+        domains = self.tracked_domains()
+        return domains is not None and domains.infeasible()
+
+    def assign(self, row_ix: int, col_ix: int, value: int):
+        old_value = self.puzzle[row_ix][col_ix]
+        self.trail.append((row_ix, col_ix, old_value))
+        if old_value != 0:
+            self.remove(row_ix, col_ix)
+        self.place(row_ix, col_ix, value)
+
+    def undo(self, mark: int):
+        trail = self.trail
+        while len(trail) > mark:
+            row_ix, col_ix, old_value = trail.pop()
+            self.remove(row_ix, col_ix)
+            if old_value != 0:
+                self.place(row_ix, col_ix, old_value)
+
+    def options(self, row_ix: int, col_ix: int) -> int:
+        used = 0
+        if self.normal:
+            used = self.rows[row_ix] | self.cols[col_ix] | \
+                self.blocks[BLOCK_INDEX[row_ix][col_ix]]
+        for cage_ix in self.cell_cages[row_ix][col_ix]:
+            used |= self.cages[cage_ix]
+        if self.no_consecutive:
+            puzzle = self.puzzle
+            for i, j in ADJACENTS[row_ix][col_ix]:
+                used |= CONSECUTIVE_MASK[puzzle[i][j]]
+        return ~used & ALL_DIGITS_MASK
+
+    def hash_domains(self):
+        # Keeps the key of the domains up to date on every change, for
+        # searches that look every state up (see zobrist)
+        if self.track_domains and not isinstance(self.domains, HashedDomains):
+            self.domains = HashedDomains(self)
+
+    def zobrist(self) -> int:
+        # Key of the domains of the empty cells, see transposition.py
+        domains = self.tracked_domains()
+        if domains is not None:
+            return domains.zobrist()
+        key = 0
+        for i, row in enumerate(self.puzzle):
+            for j in range(9):
+                if row[j] == 0:
+                    key ^= ZOBRIST_KEYS[i * 9 + j][self.options(i, j)]
+        return key
+
+    def count(self, row_ix: int, col_ix: int) -> int:
+        return POPCOUNT[self.options(row_ix, col_ix)]
+
+    def digits(self, row_ix: int, col_ix: int) -> Tuple[int, ...]:
+        return MASK_DIGITS[self.options(row_ix, col_ix)]
+
+    def best_cell(self) -> Coord:
+        # Fewest candidates first, ties broken in row-major order
+        best = (9, 9)
+        best_count = 10
+        for i, row in enumerate(self.puzzle):
+            for j in range(9):
+                if row[j] != 0:
+                    continue
+                count = POPCOUNT[self.options(i, j)]
+                if count < best_count:
+                    best = (i, j)
+                    best_count = count
+                    if count <= 1:
+                        return best
+        return best
+
+
+def make_candidates(game: Game) -> Callable[[Puzzle], Candidates]:
+    normal, cages, no_consecutive, infeasible = game_constraints(game)
+
+    def candidates(puzzle: Puzzle) -> Candidates:
+        return Candidates(puzzle, normal, cages, no_consecutive, infeasible)
+
+    return candidates
+
+
+class Domains:
+    # Incremental candidate domains for the empty cells of a Candidates
+    # grid. It keeps, for every unit that needs all nine digits, how many
+    # empty cells can still take each digit, so "a cell has no candidates"
+    # and "a digit has nowhere to go" are counters instead of rescans.
+    # Placements must be undone in LIFO order.
+    def __init__(self, candidates: Candidates):
+        puzzle = candidates.puzzle
+        units, self.cell_units, self.peers = constraint_tables(
+            candidates.normal, cages_key(candidates.cages_cells))
+        self.adjacents = ADJACENT_CELLS if candidates.no_consecutive else NO_CELLS
+
+        self.domains = [candidates.options(i, j) if puzzle[i][j] == 0 else 0
+                        for i in range(9) for j in range(9)]
+        self.placed = [0] * len(units)
+        self.positions = [[0] * 10 for _ in units]
+        for unit_ix, unit in enumerate(units):
+            for cell in unit:
+                self.placed[unit_ix] |= DIGIT_MASK[puzzle[cell // 9][cell % 9]]
+                for digit in MASK_DIGITS[self.domains[cell]]:
+                    self.positions[unit_ix][digit] += 1
+
+        self.empty = sum(1 for cell in range(81)
+                         if puzzle[cell // 9][cell % 9] == 0 and self.domains[cell] == 0)
+        self.missing = sum(1 for unit_ix in range(len(self.placed))
+                           for digit in range(1, 10)
+                           if self.positions[unit_ix][digit] == 0 and
+                           not self.placed[unit_ix] & DIGIT_MASK[digit])
+
+        self.log = []
+        self.marks = []
+
+    def infeasible(self) -> bool:
+        return self.empty > 0 or self.missing > 0
+
+    def zobrist(self) -> int:
+        return zobrist_domains(self.domains)
+
+    def _remove(self, cell: int, bits: int):
+        bits &= self.domains[cell]
+        if bits == 0:
+            return
+        self.domains[cell] ^= bits
+        self.log.append((cell, bits))
+        for digit in MASK_DIGITS[bits]:
+            bit = DIGIT_MASK[digit]
+            for unit_ix in self.cell_units[cell]:
+                positions = self.positions[unit_ix]
+                positions[digit] -= 1
+                if positions[digit] == 0 and not self.placed[unit_ix] & bit:
+                    self.missing += 1
+        if self.domains[cell] == 0:
+            self.empty += 1
+
+    def _restore(self, cell: int, bits: int):
+        if self.domains[cell] == 0:
+            self.empty -= 1
+        self.domains[cell] |= bits
+        for digit in MASK_DIGITS[bits]:
+            bit = DIGIT_MASK[digit]
+            for unit_ix in self.cell_units[cell]:
+                positions = self.positions[unit_ix]
+                if positions[digit] == 0 and not self.placed[unit_ix] & bit:
+                    self.missing -= 1
+                positions[digit] += 1
+
+    def place(self, cell: int, value: int):
+        bit = DIGIT_MASK[value]
+        self.marks.append((cell, value, len(self.log)))
+        for unit_ix in self.cell_units[cell]:
+            if self.positions[unit_ix][value] == 0 and not self.placed[unit_ix] & bit:
+                self.missing -= 1
+            self.placed[unit_ix] |= bit
+
+        # The cell is filled now, so an empty domain no longer counts
+        self._remove(cell, ALL_DIGITS_MASK)
+        if self.domains[cell] == 0:
+            self.empty -= 1
+
+        for peer in self.peers[cell]:
+            if self.domains[peer] & bit:
+                self._remove(peer, bit)
+        consecutive = CONSECUTIVE_MASK[value]
+        for adjacent in self.adjacents[cell]:
+            if self.domains[adjacent] & consecutive:
+                self._remove(adjacent, consecutive)
+
+    def unplace(self, cell: int) -> bool:
+        if len(self.marks) == 0 or self.marks[-1][0] != cell:
+            return False
+        _cell, value, mark = self.marks.pop()
+        self.empty += 1
+        log = self.log
+        while len(log) > mark:
+            self._restore(*log.pop())
+
+        bit = DIGIT_MASK[value]
+        for unit_ix in self.cell_units[cell]:
+            self.placed[unit_ix] &= ~bit
+            if self.positions[unit_ix][value] == 0:
+                self.missing += 1
+        return True
+
+
+class HashedDomains(Domains):
+    # Domains with their zobrist key updated along, at the cost of a
+    # little more work per change
+    def __init__(self, candidates: Candidates):
+        super().__init__(candidates)
+        self.hash = zobrist_domains(self.domains)
+
+    def zobrist(self) -> int:
+        return self.hash
+
+    def _remove(self, cell: int, bits: int):
+        domain = self.domains[cell]
+        super()._remove(cell, bits)
+        keys = ZOBRIST_KEYS[cell]
+        self.hash ^= keys[domain] ^ keys[self.domains[cell]]
+
+    def _restore(self, cell: int, bits: int):
+        domain = self.domains[cell]
+        super()._restore(cell, bits)
+        keys = ZOBRIST_KEYS[cell]
+        self.hash ^= keys[domain] ^ keys[self.domains[cell]]
@@ -0,0 +1,54 @@
+import os
+import pickle
+from pathlib import Path
+from time import perf_counter
+
+# Nodes between two looks at the clock, few enough that slow searches
+# (hundreds of nodes per second) still save close to on time
+CHECKPOINT_CHECK_NODES = 256
+
+
+class Checkpoint:
+    # Saves the state of a search every `interval` seconds. due() is
+    # called once per node, so it only counts down and reads the clock
+    # every CHECKPOINT_CHECK_NODES nodes.
+    def __init__(self, path: Path, interval: float = 60.0):
+        self.path = Path(path)
+        self.interval = interval
+        self.countdown = CHECKPOINT_CHECK_NODES
+        self.next_time = perf_counter() + interval
+        self.saved = 0
+
+    def due(self) -> bool:
+        self.countdown -= 1
+        if self.countdown > 0:
+            return False
+        self.countdown = CHECKPOINT_CHECK_NODES
+        return perf_counter() >= self.next_time
+
+    def save(self, state: dict):
+        # Written next to the checkpoint and renamed over it, so an
+        # interrupted save leaves the previous checkpoint
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(temp_path, "wb") as f:
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self.saved += 1
+        self.next_time = perf_counter() + self.interval
+
+    def remove(self):
+        if self.path.exists():
+            self.path.unlink()
+
+
+def load_checkpoint(path: Path) -> dict:
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def check_checkpoint(state: dict, name: str, puzzle: str):
+    if state["name"] != name or state["puzzle"] != puzzle:
+        raise ValueError(f"Checkpoint is of a {state['name']} search of "
+                         f"{state['puzzle']}, not of this one")
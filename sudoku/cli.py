@@ -1,33 +1,46 @@
 import argparse
 import asyncio
 import concurrent.futures
+import functools
 import glob
 import itertools
 import os
+import random
 import subprocess
+import sys
 import time
 from pathlib import Path
 
 import sudoku.solver_v2
 
-from .collect_next_steps import (make_collect_valid_blocks,
-                                 make_collect_valid_options,
-                                 make_collect_valid_options_with_game,
-                                 rule_from_game)
+from .archive import Archive, ArchiveWriter, is_archive, solutions_path
+from .batch import (Answered, count_batch_item, format_batch_result,
+                    is_sliceable_input, iter_batch_games, solve_batch,
+                    solve_batch_stored)
+from .bench import (bench_matrix, bench_puzzles, compare_results,
+                    format_bench_result, load_results, run_bench,
+                    save_results)
+from .budget import BudgetExhausted
+from .checkpoint import Checkpoint, load_checkpoint
+from .collect_next_steps import rule_from_game
+from .config import SolverConfig, make_budget, make_next_step, make_solver
+from .dlx import SolverDLX
+from .frontier import FrontierFull
+from .generate import format_generated, generate_games
+from .grid import grid_from_line, grid_to_line
 from .helpers import (check_puzzle_is_complete, check_puzzle_is_solution,
-                      puzzle_display, puzzle_from_csv, puzzle_from_txt,
+                      game_from_file, game_to_file, puzzle_display,
+                      puzzle_from_csv, puzzle_from_line, puzzle_from_txt,
                       why_is_invalid)
-from .logger import Logger
+from .logger import Logger, ProgressReporter
 from .metrics import Metrics
-from .next_step import (SEQUENCE_1, make_compute_next_step,
-                        make_compute_next_step_block_column,
-                        make_compute_next_step_block_row,
-                        make_compute_next_step_heuristic1,
-                        make_compute_next_step_heuristic2,
-                        make_compute_next_step_sequence)
+from .parallel import solve_processes
+from .reader import byte_ranges
 from .rules import rule_apply_puzzle
-from .solver import Solver
+from .serve import run_server
+from .store import SolutionStore
 from .types import Game
+from .vectorized import solve_batch_vectorized
 
 
 def cmd_run(args, **kwargs):
@@ -94,15 +107,8 @@ def interactive(solver, puzzle):
     return solution
 
 
-def game_from_file(file_path: Path) -> Game:
-    if file_path.suffix == ".csv":
-        puzzle = puzzle_from_csv(file_path)
-        rules = ["normal rules"]
-        return Game(puzzle, [], rules)
-    elif file_path.suffix == ".txt":
-        return puzzle_from_txt(file_path)
-    else:
-        raise ValueError(f"Unknown file type: {file_path}")
+# Solve types whose frontier can be saved and restored
+CHECKPOINT_SOLVE_TYPES = ["iterative", "smart", "iterative_bfs"]
 
 
 def command_solve(args):
@@ -113,57 +119,99 @@ def command_solve(args):
     puzzle_display(game.puzzle)
     print()
 
-    if args.next_step == "base":
-        next_step = make_compute_next_step(puzzle)
-    elif args.next_step == "block_column":
-        next_step = make_compute_next_step_block_column(puzzle)
-    elif args.next_step == "block_row":
-        next_step = make_compute_next_step_block_row(puzzle)
-    elif args.next_step == "heuristic1":
-        next_step = make_compute_next_step_heuristic1(puzzle)
-    elif args.next_step == "heuristic2":
-        next_step = make_compute_next_step_heuristic2(puzzle)
-    elif args.next_step == "sequence1":
-        next_step = make_compute_next_step_sequence(SEQUENCE_1)
-    else:
-        next_step = make_compute_next_step(puzzle)
-
-    if len(game.rules) > 0:
-        collect_next_steps = make_collect_valid_options_with_game(game)
-    elif args.collect_next_steps == "valid_options":
-        collect_next_steps = make_collect_valid_options()
-    elif args.collect_next_steps == "valid_blocks":
-        collect_next_steps = make_collect_valid_blocks()
-    else:
-        collect_next_steps = make_collect_valid_options()
-
-    if args.solver_version == "v1":
-        logger = Logger(args.logger_iterations)
+    config = SolverConfig(args.next_step, args.collect_next_steps,
+                          args.propagation, args.solve_type,
+                          args.solver_version, args.infeasible,
+                          args.priority, args.max_frontier, args.flat,
+                          args.transposition, max_nodes=args.max_nodes,
+                          timeout=args.timeout)
+
+    checkpoint = resume = None
+    if args.checkpoint or args.resume:
+        if args.solver_version == "v1" and args.solve_type not in CHECKPOINT_SOLVE_TYPES:
+            print(f"ERROR: checkpoints need one of the solve types "
+                  f"{', '.join(CHECKPOINT_SOLVE_TYPES)}, or --solver-version v2")
+            return
+        if args.solver_version == "dlx" or args.interactive:
+            print("ERROR: checkpoints are not supported by the dlx solver "
+                  "or the interactive mode")
+            return
+        if args.checkpoint:
+            checkpoint = Checkpoint(args.checkpoint, args.checkpoint_interval)
+        if args.resume:
+            resume = load_checkpoint(args.resume)
+
+    store = SolutionStore(args.cache) if args.cache else None
+    stored = store.get(game) if store is not None else None
+
+    if stored is not None:
         metrics = Metrics()
-        solver = Solver(next_step, collect_next_steps, metrics, logger)
+        solution = puzzle_from_line(stored.solution)
+        print(f"Solution from {args.cache}: {stored.nodes} nodes, "
+              f"{stored.duration:.6f}s")
+        print()
+    elif args.solver_version == "v1":
+        if args.progress:
+            logger = ProgressReporter(args.progress, args.progress_output)
+        else:
+            logger = Logger(args.logger_iterations)
+        metrics = Metrics(args.metrics_timing, args.metrics_histograms)
+        solver = make_solver(config, game, metrics, logger)
+        solver.checkpoint = checkpoint
+        solver.resume = resume
+        solver.budget = make_budget(config)
 
         metrics.start()
         logger.start()
 
-        if args.interactive:
-            solution = interactive(solver, puzzle)
-        else:
-            if args.solve_type == "recursive":
-                solution = solver.solve_recursive(puzzle)
-            elif args.solve_type == "iterative_bfs":
-                # Not good
-                solution = solver.solve_iterative_bfs(puzzle)
-            elif args.solve_type == "threads":
-                # Not so good
-                solution = solver.solve_threads(puzzle)
-            elif args.solve_type == "smart":
-                solution = solver.solve_smart(puzzle)
+        try:
+            if args.interactive:
+                solution = interactive(solver, puzzle)
             else:
-                solution = solver.solve_iterative(puzzle)
+                if args.solve_type == "recursive":
+                    solution = solver.solve_recursive(puzzle)
+                elif args.solve_type == "iterative_bfs":
+                    solution = solver.solve_iterative_bfs(puzzle)
+                elif args.solve_type == "threads":
+                    # Not so good
+                    solution = solver.solve_threads(puzzle)
+                elif args.solve_type == "smart":
+                    solution = solver.solve_smart(puzzle)
+                elif args.solve_type == "inplace":
+                    solution = solver.solve_inplace(puzzle)
+                elif args.solve_type == "processes":
+                    solution = solve_processes(config, game, metrics,
+                                               args.workers, args.split_nodes,
+                                               solver.budget)
+                else:
+                    solution = solver.solve_iterative(puzzle)
+        except (FrontierFull, BudgetExhausted) as e:
+            print(f"ERROR: {e}")
+            solution = None
+        except ValueError as e:
+            # A checkpoint of another search
+            print(f"ERROR: {e}")
+            return
 
         metrics.end()
         logger.end()
 
+        if args.show_metrics:
+            metrics.display()
+            print()
+    elif args.solver_version == "dlx":
+        metrics = Metrics()
+        solver = SolverDLX(game, metrics)
+        solver.budget = make_budget(config)
+
+        metrics.start()
+        try:
+            solution = solver.solve(puzzle)
+        except BudgetExhausted as e:
+            print(f"ERROR: {e}")
+            solution = None
+        metrics.end()
+
         if args.show_metrics:
             metrics.display()
             print()
@@ -172,20 +220,38 @@ def command_solve(args):
         metrics.start()
         solution = [[x for x in row] for row in puzzle]  # Copy puzzle
 
+        next_step = make_next_step(config.next_step, puzzle)
         solver = sudoku.solver_v2.PuzzleSolver(solution, next_step)
         solver.add_rule(sudoku.solver_v2.RuleHorizontal())
         solver.add_rule(sudoku.solver_v2.RuleVertical())
         solver.add_rule(sudoku.solver_v2.RuleBlock())
 
-        solver.solve()
+        try:
+            solver.solve(checkpoint, resume, make_budget(config))
+        except BudgetExhausted as e:
+            print(f"ERROR: {e}")
+            solution = None
+        except ValueError as e:
+            print(f"ERROR: {e}")
+            return
         metrics.end()
 
         if args.show_metrics:
             metrics.display()
             print()
 
+    if args.metrics_output:
+        metrics.export(args.metrics_output)
+
+    if store is not None:
+        if stored is None and solution and check_puzzle_is_solution(puzzle, solution):
+            duration = (metrics.duration_ns() or 0) / 1e9
+            store.put(game, solution, metrics.nodes(), duration)
+        store.close()
+
     print("Puzzle Solution: ")
-    puzzle_display(solution)
+    if solution:
+        puzzle_display(solution)
 
     if not solution or not check_puzzle_is_solution(puzzle, solution):
         print()
@@ -202,6 +268,186 @@ def command_solve(args):
             print("Puzzle solution: VALID + NO MATCH")
 
 
+def parse_shard(text):
+    try:
+        index, count = map(int, text.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected INDEX/COUNT, got {text!r}")
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must be in [0, {count})")
+    return index, count
+
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"expected at least 1, got {value}")
+    return value
+
+
+def non_negative_int(text):
+    value = int(text)
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"expected at least 0, got {value}")
+    return value
+
+
+def command_solve_batch(args):
+    config = SolverConfig(args.next_step, args.collect_next_steps,
+                          args.propagation, args.solve_type,
+                          args.solver_version, args.infeasible,
+                          args.priority, args.max_frontier, args.flat,
+                          args.transposition, args.symmetry_cache,
+                          args.max_nodes, args.timeout)
+    workers = args.workers or os.cpu_count()
+    if (args.shard, args.skip, args.limit) != (None, 0, None) and \
+            not is_sliceable_input(args.puzzles_path, args.input_format):
+        print("ERROR: --shard, --skip and --limit need a file of lines or an archive")
+        return
+    if args.archive_solutions and not is_archive(args.puzzles_path):
+        print("ERROR: --archive-solutions needs an archive as input")
+        return
+    start, end = 0, None
+    if args.shard is not None:
+        index, count = args.shard
+        start, end = byte_ranges(args.puzzles_path, count)[index]
+    items = iter_batch_games(args.puzzles_path, start, end, args.skip,
+                             args.limit, args.input_format)
+    solve = solve_batch_vectorized if args.vectorized else solve_batch
+    if args.cache:
+        store = SolutionStore(args.cache)
+        results = solve_batch_stored(config, items, workers, store,
+                                     args.order == "input", solve)
+    else:
+        store = None
+        results = solve(config, items, workers, args.order == "input")
+
+    solutions = None
+    if args.archive_solutions:
+        with Archive(args.puzzles_path) as archive:
+            solutions = ArchiveWriter(solutions_path(args.puzzles_path),
+                                      archive.rules, archive.cages)
+
+    for result in results:
+        print(format_batch_result(result), flush=True)
+        name, status, _nodes, _duration, solution = result
+        if solutions is not None and status in ["solved", "cached"]:
+            solutions.put(int(name.rsplit("#", 1)[1]), grid_from_line(solution))
+    if store is not None:
+        store.close()
+    if solutions is not None:
+        solutions.close()
+
+
+def command_serve(args):
+    config = SolverConfig(args.next_step, args.collect_next_steps,
+                          args.propagation, args.solve_type,
+                          args.solver_version, args.infeasible,
+                          args.priority, args.max_frontier, args.flat,
+                          args.transposition, args.symmetry_cache,
+                          args.max_nodes)
+    workers = args.workers or os.cpu_count()
+    max_pending = args.max_pending or workers * 4
+    run_server(config, args.host, args.port, workers, max_pending,
+               args.timeout)
+
+
+def command_count_solutions(args):
+    config = SolverConfig(args.next_step, propagation=args.propagation,
+                          solve_type="inplace",
+                          solver_version=args.solver_version,
+                          infeasible=args.infeasible,
+                          transposition=args.transposition,
+                          max_nodes=args.max_nodes, timeout=args.timeout)
+    workers = args.workers or os.cpu_count()
+    items = itertools.chain.from_iterable(
+        iter_batch_games(path, input_format=args.input_format)
+        for path in args.puzzles_path)
+    func = functools.partial(count_batch_item, limit=args.limit)
+    for result in solve_batch(config, items, workers, args.order == "input",
+                              func=func):
+        print(format_batch_result(result), flush=True)
+
+
+def command_pack(args):
+    writer = None
+    packed = 0
+    for path in args.puzzles_path:
+        for item in iter_batch_games(path, input_format=args.input_format):
+            if isinstance(item, Answered):
+                name, _status, _nodes, _duration, error = item.result
+                print(f"{name}: invalid ({error}), skipped", file=sys.stderr)
+                continue
+            name, game = item
+            if writer is None:
+                writer = ArchiveWriter(args.output, game.rules, game.cages)
+                rules, cages = game.rules, game.cages
+            elif (game.rules, game.cages) != (rules, cages):
+                print(f"{name}: other rules or cages, skipped", file=sys.stderr)
+                continue
+            writer.append(game.puzzle)
+            packed += 1
+    if writer is not None:
+        writer.close()
+    print(f"Packed {packed} puzzles into {args.output}", file=sys.stderr)
+
+
+def command_unpack(args):
+    with Archive(args.archive_path) as archive:
+        if args.format == "lines":
+            for grid in archive:
+                print(grid_to_line(grid))
+            return
+        args.output.mkdir(parents=True, exist_ok=True)
+        for index in range(len(archive)):
+            game_to_file(archive.game(index),
+                         args.output / f"{index}.{args.format}")
+
+
+def command_generate(args):
+    if args.template:
+        template = game_from_file(args.template)
+    else:
+        template = Game([[0] * 9 for _ in range(9)], [], ["normal rules"])
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    workers = args.workers or os.cpu_count()
+
+    start_time = time.perf_counter()
+    generated = 0
+    for result in generate_games(template, args.count, seed, args.clues, workers):
+        if result is None:
+            continue
+        generated += 1
+        print(format_generated(result), flush=True)
+    duration = time.perf_counter() - start_time
+
+    print(f"Generated {generated} puzzles in {duration:.3f}s "
+          f"({generated / duration:.2f} puzzles/s)", file=sys.stderr)
+
+
+def command_bench(args):
+    puzzles = [puzzle for path in args.puzzles_path
+               for puzzle in bench_puzzles(path)]
+    cases = bench_matrix(puzzles, args.solver_version, args.solve_type,
+                         args.next_step, args.collect_next_steps)
+
+    results = []
+    for result in run_bench(cases, args.repeats, args.warmup):
+        print(format_bench_result(result), flush=True)
+        results.append(result)
+
+    if args.output:
+        save_results(args.output, results)
+
+    if args.baseline:
+        regressions = compare_results(
+            results, load_results(args.baseline), args.max_slowdown)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
 def command_is_valid(args):
     if args.puzzle_path.suffix == ".csv":
         puzzle = puzzle_from_csv(args.puzzle_path)
@@ -243,18 +489,214 @@ def get_parser():
     sb.add_argument('-i', '--interactive', action='store_true',
                     help='Interactive mode')
     sb.add_argument('--solver-version',
-                    choices=["v1", "v2"], default="v1", help='Solver version')
+                    choices=["v1", "v2", "dlx"], default="v1", help='Solver version')
     sb.add_argument('--solve-type',
-                    choices=["recursive", "iterative", "iterative_bfs", "threads", "smart"], default="iterative", help='Solve type')
+                    choices=["recursive", "iterative", "iterative_bfs", "threads", "smart", "inplace", "processes"], default="iterative", help='Solve type')
     sb.add_argument('--next-step',
-                    choices=["base", "block_column", "block_row", "heuristic1", "heuristic2", "sequence1"], default="base", help='Next step')
+                    choices=["base", "block_column", "block_row", "heuristic1", "heuristic2", "sequence1", "mrv"], default="base", help='Next step')
     sb.add_argument('--collect-next-steps',
                     choices=["valid_options", "valid_blocks"], default="valid_options", help='Collect next steps')
+    sb.add_argument('--workers', type=int, default=None,
+                    help='Number of worker processes (processes solve type)')
+    sb.add_argument('--split-nodes', type=int, default=100_000,
+                    help='Nodes a worker explores before re-splitting its subtree')
+    sb.add_argument('--propagation', action='store_true',
+                    help='Fill naked and hidden singles before branching')
+    sb.add_argument('--infeasible', action='store_true',
+                    help='Track candidates incrementally to detect dead ends (inplace solve type)')
+    sb.add_argument('--priority', choices=["filled", "domain"], default="filled",
+                    help='Best first order: fewest empty cells or smallest domain (iterative_bfs solve type)')
+    sb.add_argument('--max-frontier', type=int, default=None,
+                    help='Maximum number of open nodes kept by the iterative, smart and iterative_bfs solve types')
+    sb.add_argument('--flat', action='store_true',
+                    help='Search on flat 81 byte grids instead of nested lists')
+    sb.add_argument('--transposition', type=int, metavar='SIZE',
+                    help='Skip states refuted before, remembering up to SIZE of them (implies --infeasible)')
+    sb.add_argument('--max-nodes', type=int, metavar='N',
+                    help='Stop the search after N nodes')
+    sb.add_argument('--timeout', type=float, metavar='SECONDS',
+                    help='Stop the search after SECONDS')
+    sb.add_argument('--cache', type=Path, metavar='PATH',
+                    help='SQLite file of known solutions, read before solving and updated after')
+    sb.add_argument('--checkpoint', type=Path, metavar='PATH',
+                    help='Save the search to PATH every --checkpoint-interval seconds (iterative, smart, iterative_bfs and v2)')
+    sb.add_argument('--checkpoint-interval', type=float, default=60.0, metavar='SECONDS',
+                    help='Seconds between checkpoints')
+    sb.add_argument('--resume', type=Path, metavar='PATH',
+                    help='Continue the search saved in a checkpoint')
     sb.add_argument('--logger-iterations', type=int, default=1e10,
                     help='Number of iterations to log')
+    sb.add_argument('--progress', type=float, metavar='SECONDS',
+                    help='Report progress as JSON lines every SECONDS (instead of --logger-iterations)')
+    sb.add_argument('--progress-output', type=argparse.FileType('w'),
+                    help='Write progress reports to this file instead of stderr')
     sb.add_argument('--show-metrics', action='store_true', help='Show metrics')
+    sb.add_argument('--metrics-timing', action='store_true',
+                    help='Time the search phases (next step, rule check, copy, ...)')
+    sb.add_argument('--metrics-histograms', action='store_true',
+                    help='Record branching factor and depth histograms')
+    sb.add_argument('--metrics-output', type=Path,
+                    help='Export metrics as JSON, or CSV for a .csv path')
     sb.add_argument('--solution-path', help='Path to the solution CSV file')
 
+    sb = command(command_solve_batch)
+    sb.add_argument('puzzles_path', type=Path,
+                    help='Directory of puzzle files or a file with one puzzle per line')
+    sb.add_argument('--input-format', choices=["auto", "lines", "puzzle"], default="auto",
+                    help='Read files as one puzzle per line or as a single puzzle file (auto: .csv files hold one puzzle, others one per line)')
+    sb.add_argument('--shard', type=parse_shard, metavar='INDEX/COUNT',
+                    help='Only the lines starting in byte range INDEX of COUNT equal ones of the file')
+    sb.add_argument('--skip', type=non_negative_int, default=0,
+                    help='Skip this many puzzle lines (of the shard)')
+    sb.add_argument('--limit', type=positive_int, default=None,
+                    help='Solve at most this many puzzle lines (of the shard)')
+    sb.add_argument('--archive-solutions', action='store_true',
+                    help='Write solutions of an archive to its .solutions sibling, record by record')
+    sb.add_argument('--workers', type=int, default=None,
+                    help='Number of worker processes')
+    sb.add_argument('--order', choices=["input", "completion"], default="input",
+                    help='Output results in input or completion order')
+    sb.add_argument('--solver-version',
+                    choices=["v1", "dlx"], default="v1", help='Solver version')
+    sb.add_argument('--solve-type',
+                    choices=["recursive", "iterative", "iterative_bfs", "smart", "inplace"], default="iterative", help='Solve type')
+    sb.add_argument('--next-step',
+                    choices=["base", "block_column", "block_row", "heuristic1", "heuristic2", "sequence1", "mrv"], default="base", help='Next step')
+    sb.add_argument('--collect-next-steps',
+                    choices=["valid_options", "valid_blocks"], default="valid_options", help='Collect next steps')
+    sb.add_argument('--propagation', action='store_true',
+                    help='Fill naked and hidden singles before branching')
+    sb.add_argument('--infeasible', action='store_true',
+                    help='Track candidates incrementally to detect dead ends (inplace solve type)')
+    sb.add_argument('--priority', choices=["filled", "domain"], default="filled",
+                    help='Best first order: fewest empty cells or smallest domain (iterative_bfs solve type)')
+    sb.add_argument('--max-frontier', type=int, default=None,
+                    help='Maximum number of open nodes kept by the iterative, smart and iterative_bfs solve types')
+    sb.add_argument('--flat', action='store_true',
+                    help='Search on flat 81 byte grids instead of nested lists')
+    sb.add_argument('--transposition', type=int, metavar='SIZE',
+                    help='Skip states refuted before, remembering up to SIZE of them (implies --infeasible)')
+    sb.add_argument('--max-nodes', type=int, metavar='N',
+                    help='Stop the search after N nodes')
+    sb.add_argument('--timeout', type=float, metavar='SECONDS',
+                    help='Stop the search after SECONDS')
+    sb.add_argument('--cache', type=Path, metavar='PATH',
+                    help='SQLite file of known solutions, read before solving and updated after')
+    sb.add_argument('--symmetry-cache', type=int, metavar='SIZE',
+                    help='Reuse solutions of relabeled or reordered copies of a puzzle, keeping SIZE per worker')
+    sb.add_argument('--vectorized', action='store_true',
+                    help='Fill singles of standard puzzles in bulk with numpy, only the rest are searched')
+
+    sb = command(command_serve)
+    sb.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    sb.add_argument('--port', type=int, default=8081, help='Port to listen on')
+    sb.add_argument('--workers', type=int, default=None,
+                    help='Number of worker processes')
+    sb.add_argument('--max-pending', type=int, default=None,
+                    help='Solves queued or running before requests get a 503 (default: 4 per worker)')
+    sb.add_argument('--timeout', type=float, default=10.0, metavar='SECONDS',
+                    help='Longest a request may take, requests can ask for less')
+    sb.add_argument('--solver-version',
+                    choices=["v1", "dlx"], default="v1", help='Solver version')
+    sb.add_argument('--solve-type',
+                    choices=["recursive", "iterative", "iterative_bfs", "smart", "inplace"], default="inplace", help='Solve type')
+    sb.add_argument('--next-step',
+                    choices=["base", "block_column", "block_row", "heuristic1", "heuristic2", "sequence1", "mrv"], default="mrv", help='Next step')
+    sb.add_argument('--collect-next-steps',
+                    choices=["valid_options", "valid_blocks"], default="valid_options", help='Collect next steps')
+    sb.add_argument('--propagation', action='store_true',
+                    help='Fill naked and hidden singles before branching')
+    sb.add_argument('--infeasible', action='store_true',
+                    help='Track candidates incrementally to detect dead ends (inplace solve type)')
+    sb.add_argument('--priority', choices=["filled", "domain"], default="filled",
+                    help='Best first order: fewest empty cells or smallest domain (iterative_bfs solve type)')
+    sb.add_argument('--max-frontier', type=int, default=None,
+                    help='Maximum number of open nodes kept by the iterative, smart and iterative_bfs solve types')
+    sb.add_argument('--flat', action='store_true',
+                    help='Search on flat 81 byte grids instead of nested lists')
+    sb.add_argument('--transposition', type=int, metavar='SIZE',
+                    help='Skip states refuted before, remembering up to SIZE of them (implies --infeasible)')
+    sb.add_argument('--max-nodes', type=int, metavar='N',
+                    help='Stop a search after N nodes')
+    sb.add_argument('--symmetry-cache', type=int, metavar='SIZE',
+                    help='Reuse solutions of relabeled or reordered copies of a puzzle, keeping SIZE per worker')
+
+    sb = command(command_count_solutions)
+    sb.add_argument('puzzles_path', type=Path, nargs='+',
+                    help='Puzzle files, directories of them or files with one puzzle per line')
+    sb.add_argument('--input-format', choices=["auto", "lines", "puzzle"], default="auto",
+                    help='Read files as one puzzle per line or as a single puzzle file (auto: .csv files hold one puzzle, others one per line)')
+    sb.add_argument('--limit', type=positive_int, default=2,
+                    help='Stop after this many solutions (2 checks uniqueness)')
+    sb.add_argument('--workers', type=int, default=None,
+                    help='Number of worker processes')
+    sb.add_argument('--order', choices=["input", "completion"], default="input",
+                    help='Output results in input or completion order')
+    sb.add_argument('--solver-version',
+                    choices=["v1", "dlx"], default="v1", help='Solver version (v1 searches in place)')
+    sb.add_argument('--next-step',
+                    choices=["base", "block_column", "block_row", "heuristic1", "heuristic2", "sequence1", "mrv"], default="mrv", help='Next step')
+    sb.add_argument('--propagation', action='store_true',
+                    help='Fill naked and hidden singles before branching')
+    sb.add_argument('--infeasible', action='store_true',
+                    help='Track candidates incrementally to detect dead ends')
+    sb.add_argument('--transposition', type=int, metavar='SIZE',
+                    help='Skip states refuted before, remembering up to SIZE of them (implies --infeasible)')
+    sb.add_argument('--max-nodes', type=int, metavar='N',
+                    help='Stop the search after N nodes')
+    sb.add_argument('--timeout', type=float, metavar='SECONDS',
+                    help='Stop the search after SECONDS')
+
+    sb = command(command_pack)
+    sb.add_argument('puzzles_path', type=Path, nargs='+',
+                    help='Puzzle files, directories of them or files with one puzzle per line')
+    sb.add_argument('--input-format', choices=["auto", "lines", "puzzle"], default="auto",
+                    help='Read files as one puzzle per line or as a single puzzle file (auto: .csv files hold one puzzle, others one per line)')
+    sb.add_argument('-o', '--output', type=Path, required=True,
+                    help='Archive to write, appended to when it exists')
+
+    sb = command(command_unpack)
+    sb.add_argument('archive_path', type=Path, help='Archive to read')
+    sb.add_argument('--format', choices=["lines", "csv", "txt"], default="lines",
+                    help='One puzzle per line on stdout, or one file per puzzle')
+    sb.add_argument('-o', '--output', type=Path, default=Path("."),
+                    help='Directory for the csv/txt files')
+
+    sb = command(command_generate)
+    sb.add_argument('--count', type=int, default=1,
+                    help='Number of puzzles to generate')
+    sb.add_argument('--seed', type=int, default=None,
+                    help='Seed of the first puzzle, the next ones use seed + 1, ...')
+    sb.add_argument('--clues', type=int, default=None,
+                    help='Stop removing clues at this many (fewer unique puzzles may not exist)')
+    sb.add_argument('--template', type=Path,
+                    help='Puzzle file whose rules, cages and digits the puzzles keep')
+    sb.add_argument('--workers', type=int, default=None,
+                    help='Number of worker processes')
+
+    sb = command(command_bench)
+    sb.add_argument('puzzles_path', type=Path, nargs='*',
+                    default=[Path("puzzles/easy.csv"), Path("puzzles/hard_1.csv"),
+                             Path("puzzles/hard_2.csv")],
+                    help='Puzzle files or directories (solution files are skipped)')
+    sb.add_argument('--solver-version', nargs='+',
+                    choices=["v1", "dlx"], default=["v1", "dlx"], help='Solver versions')
+    sb.add_argument('--solve-type', nargs='+',
+                    choices=["recursive", "iterative", "iterative_bfs", "smart", "inplace"], default=["iterative", "inplace"], help='Solve types')
+    sb.add_argument('--next-step', nargs='+',
+                    choices=["base", "block_column", "block_row", "heuristic1", "heuristic2", "sequence1", "mrv"], default=["base", "mrv"], help='Next steps')
+    sb.add_argument('--collect-next-steps', nargs='+',
+                    choices=["valid_options", "valid_blocks"], default=["valid_options"], help='Collect next steps')
+    sb.add_argument('--repeats', type=positive_int, default=5,
+                    help='Timed runs per configuration')
+    sb.add_argument('--warmup', type=int, default=1,
+                    help='Untimed runs per configuration')
+    sb.add_argument('--output', type=Path, help='Write the results as JSON')
+    sb.add_argument('--baseline', type=Path,
+                    help='JSON results to compare against')
+    sb.add_argument('--max-slowdown', type=float, default=0.10,
+                    help='Exit with an error when a configuration is slower than the baseline by more than this fraction')
+
     sb = command(command_is_valid)
     sb.add_argument(
         'puzzle_path', help='Path to the puzzle CSV file', type=Path)
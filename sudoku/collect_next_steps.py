@@ -1,16 +1,30 @@
 from typing import List, Set, Tuple
 
+from .candidates import (MASK_DIGITS, Candidates, make_candidates,
+                         make_grid_options_mask, make_options_mask,
+                         options_mask)
+from .grid import Grid
 from .helpers import (cage_assert, check_blocks_is_valid,
                       collect_block_indexes, collect_puzzle_block,
                       collect_puzzle_blocks, compute_block_index, puzzle_copy)
-from .rules import (RuleAll, RuleBasic, RuleCage,
+from .metrics import Metrics
+from .rules import (RuleBasic, RuleCage, RuleCompiled,
                     RuleConsecutivesOrtogonalAdjacents, RuleInfeasible)
 from .types import Cage, Coord, Game, Puzzle
 
 
 class CollectNextSteps:
-    def __init__(self, collector):
+    def __init__(self, collector, make_candidates=Candidates, options=None,
+                 collect_options=None):
         self.collector = collector
+        self.make_candidates = make_candidates
+        # Mask of valid options for a cell, when the collector is
+        # collect_options over it (lets the phases be timed apart)
+        self.options = options
+        self.collect_options = collect_options
+
+    def candidates(self, puzzle: Puzzle) -> Candidates:
+        return self.make_candidates(puzzle)
 
     def collect(self, puzzle: Puzzle,
                 row_ix: int, col_ix: int,
@@ -18,24 +32,49 @@ class CollectNextSteps:
         return self.collector(puzzle, row_ix, col_ix, next_row_ix, next_col_ix)
 
 
-def collect_valid_options(puzzle: Puzzle,
-                          row_ix: int, col_ix: int,
-                          next_row_ix: int, next_col_ix: int) -> List[Tuple[Puzzle, int, int]]:
-    row = puzzle[row_ix]
-    col = [puzzle[i][col_ix] for i in range(9)]
-    block = collect_puzzle_block(puzzle, compute_block_index(row_ix, col_ix))
-    options = set(range(1, 10)) - set(row) - set(col) - set(block)
+def collect_options_mask(puzzle: Puzzle,
+                         row_ix: int, col_ix: int,
+                         next_row_ix: int, next_col_ix: int,
+                         options: int) -> List[Tuple[Puzzle, int, int]]:
     nexts = []
-    for option in options:
+    for option in reversed(MASK_DIGITS[options]):
         puzzle[row_ix][col_ix] = option
         nexts.append((puzzle_copy(puzzle), next_row_ix, next_col_ix))
-        puzzle[row_ix][col_ix] = 0
-    nexts.reverse()
+    puzzle[row_ix][col_ix] = 0
     return nexts
 
 
+def make_timed_collect_next_steps(collect_next_steps: CollectNextSteps,
+                                  metrics: Metrics) -> CollectNextSteps:
+    make_candidates = metrics.timed(
+        "Phase Candidates", collect_next_steps.make_candidates)
+    if collect_next_steps.options is None:
+        collector = metrics.timed(
+            "Phase Collect", collect_next_steps.collector)
+        return CollectNextSteps(collector, make_candidates)
+
+    options = metrics.timed("Phase Rule Check", collect_next_steps.options)
+    copy = metrics.timed("Phase Copy", collect_next_steps.collect_options)
+
+    def collector(puzzle: Puzzle,
+                  row_ix: int, col_ix: int,
+                  next_row_ix: int, next_col_ix: int) -> List[Tuple[Puzzle, int, int]]:
+        return copy(puzzle, row_ix, col_ix, next_row_ix, next_col_ix,
+                    options(puzzle, row_ix, col_ix))
+    return CollectNextSteps(collector, make_candidates, options,
+                            collect_next_steps.collect_options)
+
+
+def collect_valid_options(puzzle: Puzzle,
+                          row_ix: int, col_ix: int,
+                          next_row_ix: int, next_col_ix: int) -> List[Tuple[Puzzle, int, int]]:
+    return collect_options_mask(puzzle, row_ix, col_ix, next_row_ix, next_col_ix,
+                                options_mask(puzzle, row_ix, col_ix))
+
+
 def make_collect_valid_options():
-    return CollectNextSteps(collect_valid_options)
+    return CollectNextSteps(collect_valid_options, options=options_mask,
+                            collect_options=collect_options_mask)
 
 
 def collect_valid_blocks(puzzle: Puzzle,
@@ -74,9 +113,9 @@ def rule_from_game(game: Game):
             raise ValueError(f"Unknown rule: {name}")
 
     if infeasible:
-        rules.append(RuleInfeasible(RuleAll(rules.copy())))
+        rules.append(RuleInfeasible(RuleCompiled(rules.copy())))
 
-    return RuleAll(rules)
+    return RuleCompiled(rules)
 
 
 def collect_valid_options_with_game2(game: Game):
@@ -156,6 +195,17 @@ def collect_valid_options_with_game2(game: Game):
     return collect
 
 
+def collect_valid_options_with_game3(game: Game):
+    game_options_mask = make_options_mask(game)
+
+    def collect(puzzle: Puzzle,
+                row_ix: int, col_ix: int,
+                next_row_ix: int, next_col_ix: int) -> List[Tuple[Puzzle, int, int]]:
+        return collect_options_mask(puzzle, row_ix, col_ix, next_row_ix, next_col_ix,
+                                    game_options_mask(puzzle, row_ix, col_ix))
+    return collect
+
+
 def collect_valid_options_with_game1(game: Game):
     rule = rule_from_game(game)
 
@@ -178,4 +228,40 @@ def make_collect_valid_options_with_game(game: Game):
     # 700000 iterations in 30s
     # return CollectNextSteps(collect_valid_options_with_game1(game))
     # 2000000 iterations in 30s
-    return CollectNextSteps(collect_valid_options_with_game2(game))
+    # return CollectNextSteps(collect_valid_options_with_game2(game))
+    # 10000000 iterations in 30s
+    return CollectNextSteps(collect_valid_options_with_game3(game),
+                            make_candidates(game), make_options_mask(game),
+                            collect_options_mask)
+
+
+def collect_grid_options_mask(grid: Grid,
+                              row_ix: int, col_ix: int,
+                              next_row_ix: int, next_col_ix: int,
+                              options: int) -> List[Tuple[Grid, int, int]]:
+    nexts = []
+    cell = row_ix * 9 + col_ix
+    for option in reversed(MASK_DIGITS[options]):
+        next_grid = bytearray(grid)
+        next_grid[cell] = option
+        nexts.append((next_grid, next_row_ix, next_col_ix))
+    return nexts
+
+
+def make_collect_grid_options(game: Game):
+    # Flat grids (see grid.py), a puzzle without rules gets the normal ones
+    if len(game.rules) == 0:
+        game = Game(game.puzzle, game.cages, ["normal rules"])
+    grid_options_mask = make_grid_options_mask(game)
+
+    def options(grid: Grid, row_ix: int, col_ix: int) -> int:
+        return grid_options_mask(grid, row_ix * 9 + col_ix)
+
+    def collect(grid: Grid,
+                row_ix: int, col_ix: int,
+                next_row_ix: int, next_col_ix: int) -> List[Tuple[Grid, int, int]]:
+        return collect_grid_options_mask(grid, row_ix, col_ix, next_row_ix, next_col_ix,
+                                         grid_options_mask(grid, row_ix * 9 + col_ix))
+
+    return CollectNextSteps(collect, make_candidates(game), options,
+                            collect_grid_options_mask)
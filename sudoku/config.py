@@ -0,0 +1,182 @@
+import itertools
+from dataclasses import dataclass
+from typing import List, Optional
+
+from .budget import (BUDGET_EXHAUSTED, SOLVED, UNSOLVABLE, Budget,
+                     BudgetExhausted, SolveResult)
+from .collect_next_steps import (CollectNextSteps, make_collect_grid_options,
+                                 make_collect_valid_blocks,
+                                 make_collect_valid_options,
+                                 make_collect_valid_options_with_game)
+from .dlx import SolverDLX
+from .frontier import FrontierFull
+from .helpers import check_puzzle_is_solution
+from .logger import Logger
+from .metrics import Metrics
+from .next_step import (SEQUENCE_1, NextStep, make_compute_next_step,
+                        make_compute_next_step_block_column,
+                        make_compute_next_step_block_row,
+                        make_compute_next_step_heuristic1,
+                        make_compute_next_step_heuristic2,
+                        make_compute_next_step_mrv,
+                        make_compute_next_step_sequence)
+from .propagation import Propagation
+from .solver import Solver
+from .symmetry import SolutionCache, is_standard_game
+from .transposition import TranspositionTable
+from .types import Game, Puzzle
+
+
+@dataclass
+class SolverConfig:
+    next_step: str = "base"
+    collect_next_steps: str = "valid_options"
+    propagation: bool = False
+    solve_type: str = "iterative"
+    solver_version: str = "v1"
+    infeasible: bool = False
+    priority: str = "filled"
+    max_frontier: Optional[int] = None
+    flat: bool = False
+    transposition: Optional[int] = None
+    symmetry_cache: Optional[int] = None
+    max_nodes: Optional[int] = None
+    timeout: Optional[float] = None
+
+
+def game_with_config(config: SolverConfig, game: Game) -> Game:
+    # The transposition table keys on the incrementally tracked domains
+    infeasible = config.infeasible or config.transposition is not None
+    if infeasible and "infeasible" not in game.rules:
+        return Game(game.puzzle, game.cages, game.rules + ["infeasible"])
+    return game
+
+
+def make_next_step(name: str, puzzle: Puzzle) -> NextStep:
+    if name == "base":
+        return make_compute_next_step(puzzle)
+    elif name == "block_column":
+        return make_compute_next_step_block_column(puzzle)
+    elif name == "block_row":
+        return make_compute_next_step_block_row(puzzle)
+    elif name == "heuristic1":
+        return make_compute_next_step_heuristic1(puzzle)
+    elif name == "heuristic2":
+        return make_compute_next_step_heuristic2(puzzle)
+    elif name == "mrv":
+        return make_compute_next_step_mrv(puzzle)
+    elif name == "sequence1":
+        return make_compute_next_step_sequence(SEQUENCE_1)
+    else:
+        return make_compute_next_step(puzzle)
+
+
+def make_collect_next_steps(name: str, game: Game,
+                            flat: bool = False) -> CollectNextSteps:
+    if flat:
+        return make_collect_grid_options(game)
+    elif len(game.rules) > 0 and not is_standard_game(game):
+        # The named collectors only apply the normal rules
+        return make_collect_valid_options_with_game(game)
+    elif name == "valid_options":
+        return make_collect_valid_options()
+    elif name == "valid_blocks":
+        return make_collect_valid_blocks()
+    else:
+        return make_collect_valid_options()
+
+
+def make_solver(config: SolverConfig, game: Game,
+                metrics: Metrics, logger: Logger) -> Solver:
+    game = game_with_config(config, game)
+    next_step = make_next_step(config.next_step, game.puzzle)
+    collect_next_steps = make_collect_next_steps(
+        config.collect_next_steps, game, config.flat)
+    propagation = Propagation(metrics) if config.propagation else None
+    transposition = None
+    if config.transposition is not None:
+        transposition = TranspositionTable(metrics, config.transposition)
+    return Solver(next_step, collect_next_steps, metrics, logger, propagation,
+                  config.max_frontier, config.priority, config.flat,
+                  transposition)
+
+
+def make_budget(config: SolverConfig, cancel=None) -> Optional[Budget]:
+    if config.max_nodes is None and config.timeout is None and cancel is None:
+        return None
+    return Budget(config.max_nodes, config.timeout, cancel)
+
+
+def solve_game(config: SolverConfig, game: Game, metrics: Metrics,
+               logger: Optional[Logger] = None,
+               cache: Optional[SolutionCache] = None,
+               budget: Optional[Budget] = None) -> Optional[Puzzle]:
+    # Raises BudgetExhausted when the budget runs out, see solve_game_result
+    if cache is not None:
+        key, transform, solution = cache.get(game, metrics)
+        if solution is not None:
+            return solution
+        solution = solve_game(config, game, metrics, logger, budget=budget)
+        if key is not None and solution is not None:
+            cache.put(key, transform, solution)
+        return solution
+
+    if config.solver_version == "dlx":
+        solver = SolverDLX(game, metrics)
+        solver.budget = budget
+        return solver.solve(game.puzzle)
+
+    solver = make_solver(config, game, metrics, logger or Logger(1e10))
+    solver.budget = budget
+    if config.solve_type == "recursive":
+        return solver.solve_recursive(game.puzzle)
+    elif config.solve_type == "iterative_bfs":
+        return solver.solve_iterative_bfs(game.puzzle)
+    elif config.solve_type == "threads":
+        return solver.solve_threads(game.puzzle)
+    elif config.solve_type == "smart":
+        return solver.solve_smart(game.puzzle)
+    elif config.solve_type == "inplace":
+        return solver.solve_inplace(game.puzzle)
+    else:
+        return solver.solve_iterative(game.puzzle)
+
+
+def solve_game_result(config: SolverConfig, game: Game,
+                      metrics: Optional[Metrics] = None,
+                      logger: Optional[Logger] = None,
+                      cache: Optional[SolutionCache] = None,
+                      cancel=None) -> SolveResult:
+    # solve_game under config.max_nodes, config.timeout and the cancel
+    # token, the stats of a search stopped early are kept. A full frontier
+    # is reported as an exhausted budget too.
+    metrics = metrics or Metrics()
+    budget = make_budget(config, cancel)
+    metrics.start()
+    try:
+        solution = solve_game(config, game, metrics, logger, cache, budget)
+    except BudgetExhausted as e:
+        return SolveResult(BUDGET_EXHAUSTED, None, e.reason, metrics)
+    except FrontierFull:
+        return SolveResult(BUDGET_EXHAUSTED, None, "max_frontier", metrics)
+    finally:
+        metrics.end()
+    if solution is not None and check_puzzle_is_solution(game.puzzle, solution):
+        return SolveResult(SOLVED, solution, "", metrics)
+    return SolveResult(UNSOLVABLE, None, "", metrics)
+
+
+def count_solutions(config: SolverConfig, game: Game, metrics: Metrics,
+                    limit: int = 2,
+                    budget: Optional[Budget] = None) -> List[Puzzle]:
+    # Up to limit solutions, limit=2 tells unique puzzles apart. The v1
+    # solver always searches in place here, the only search that goes on
+    # past a solution.
+    if config.solver_version == "dlx":
+        solver = SolverDLX(game, metrics)
+        solver.budget = budget
+        return solver.solutions(game.puzzle, limit)
+
+    solver = make_solver(config, game, metrics, Logger(1e10))
+    solver.budget = budget
+    return list(itertools.islice(solver.iter_solutions(game.puzzle), limit))
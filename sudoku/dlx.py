@@ -0,0 +1,243 @@
+from typing import Callable, List, Optional, Sequence
+
+from .budget import Budget
+from .candidates import ADJACENTS, BLOCK_INDEX, MASK_DIGITS, make_candidates
+from .helpers import puzzle_copy
+from .metrics import Metrics
+from .types import Game, Puzzle
+
+
+class DancingLinks:
+    # Exact cover over integer node arrays. Node 0 is the root, nodes
+    # 1..primary + secondary are column headers; only primary columns are
+    # linked to the root, so secondary columns are covered at most once.
+    def __init__(self, primary: int, secondary: int = 0):
+        columns = primary + secondary
+        self.L = [0] * (columns + 1)
+        self.R = [0] * (columns + 1)
+        self.U = list(range(columns + 1))
+        self.D = list(range(columns + 1))
+        self.C = list(range(columns + 1))
+        self.S = [0] * (columns + 1)
+        self.row_of = [-1] * (columns + 1)
+
+        for c in range(primary + 1):
+            self.L[c] = c - 1 if c > 0 else primary
+            self.R[c] = c + 1 if c < primary else 0
+        for c in range(primary + 1, columns + 1):
+            self.L[c] = c
+            self.R[c] = c
+
+        self.solution = []
+        self.on_node = None
+        # Called on each solution, the search goes on while it returns False
+        self.on_solution = None
+
+    def add_row(self, row_id: int, columns: Sequence[int]):
+        # Columns are 0-based, primary columns first
+        first = None
+        for column in columns:
+            c = column + 1
+            node = len(self.C)
+            self.C.append(c)
+            self.row_of.append(row_id)
+            self.U.append(self.U[c])
+            self.D.append(c)
+            self.D[self.U[c]] = node
+            self.U[c] = node
+            self.S[c] += 1
+            if first is None:
+                first = node
+                self.L.append(node)
+                self.R.append(node)
+            else:
+                self.L.append(self.L[first])
+                self.R.append(first)
+                self.R[self.L[first]] = node
+                self.L[first] = node
+
+    def cover(self, c: int):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        R[L[c]] = R[c]
+        L[R[c]] = L[c]
+        i = D[c]
+        while i != c:
+            j = R[i]
+            while j != i:
+                U[D[j]] = U[j]
+                D[U[j]] = D[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def uncover(self, c: int):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        i = U[c]
+        while i != c:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                U[D[j]] = j
+                D[U[j]] = j
+                j = L[j]
+            i = U[i]
+        R[L[c]] = c
+        L[R[c]] = c
+
+    def search(self) -> bool:
+        L, R, D, C, S = self.L, self.R, self.D, self.C, self.S
+        if self.on_node is not None:
+            self.on_node()
+        if R[0] == 0:
+            return self.on_solution is None or self.on_solution()
+
+        # Column with the fewest rows left
+        c = R[0]
+        best = c
+        while c != 0:
+            if S[c] < S[best]:
+                best = c
+                if S[c] <= 1:
+                    break
+            c = R[c]
+        c = best
+        if S[c] == 0:
+            return False
+
+        self.cover(c)
+        r = D[c]
+        while r != c:
+            self.solution.append(self.row_of[r])
+            j = R[r]
+            while j != r:
+                self.cover(C[j])
+                j = R[j]
+            if self.search():
+                return True
+            j = L[r]
+            while j != r:
+                self.uncover(C[j])
+                j = L[j]
+            self.solution.pop()
+            r = D[r]
+        self.uncover(c)
+        return False
+
+
+def encode_row(row_ix: int, col_ix: int, digit: int) -> int:
+    return (row_ix * 9 + col_ix) * 9 + digit - 1
+
+
+def decode_row(row_id: int):
+    cell, digit = divmod(row_id, 9)
+    return cell // 9, cell % 9, digit + 1
+
+
+ADJACENT_PAIRS = [((i, j), (x, y))
+                  for i in range(9) for j in range(9)
+                  for x, y in ADJACENTS[i][j]
+                  if (i, j) < (x, y)]
+ADJACENT_PAIR_INDEX = {pair: pair_ix
+                       for pair_ix, pair in enumerate(ADJACENT_PAIRS)}
+
+
+def consecutive_columns(row_ix: int, col_ix: int, digit: int):
+    # One secondary column per adjacent pair and consecutive assignment,
+    # (a, b) = (d, d + 1) or (d + 1, d), so at most one of its two rows
+    # can be selected
+    cell = (row_ix, col_ix)
+    for other in ADJACENTS[row_ix][col_ix]:
+        if cell < other:
+            pair_ix = ADJACENT_PAIR_INDEX[(cell, other)]
+            lower_first = [(digit, 0), (digit - 1, 1)]
+        else:
+            pair_ix = ADJACENT_PAIR_INDEX[(other, cell)]
+            lower_first = [(digit - 1, 0), (digit, 1)]
+        for low, orientation in lower_first:
+            if 1 <= low <= 8:
+                yield (pair_ix * 8 + low - 1) * 2 + orientation
+
+
+class SolverDLX:
+    def __init__(self, game: Game, metrics: Metrics):
+        self.game = game
+        self.metrics = metrics
+        self.make_candidates = make_candidates(game)
+        # Set by the caller to bound the searches, see Solver.budget
+        self.budget: Optional[Budget] = None
+
+    def build(self, puzzle: Puzzle) -> DancingLinks:
+        candidates = self.make_candidates(puzzle)
+        normal = candidates.normal
+        no_consecutive = candidates.no_consecutive
+        cages = len(candidates.cages)
+
+        # Primary: cell, row-digit, column-digit, block-digit
+        # Secondary: cage-digit, adjacent consecutive pairs
+        primary = 324 if normal else 81
+        consecutive_base = primary + cages * 9
+        secondary = cages * 9
+        if no_consecutive:
+            secondary += len(ADJACENT_PAIRS) * 16
+        links = DancingLinks(primary, secondary)
+        for i in range(9):
+            for j in range(9):
+                if puzzle[i][j] != 0:
+                    digits = (puzzle[i][j],)
+                else:
+                    digits = MASK_DIGITS[candidates.options(i, j)]
+                for digit in digits:
+                    columns = [i * 9 + j]
+                    if normal:
+                        columns.append(81 + i * 9 + digit - 1)
+                        columns.append(162 + j * 9 + digit - 1)
+                        columns.append(
+                            243 + BLOCK_INDEX[i][j] * 9 + digit - 1)
+                    for cage_ix in candidates.cell_cages[i][j]:
+                        columns.append(primary + cage_ix * 9 + digit - 1)
+                    if no_consecutive:
+                        for column in consecutive_columns(i, j, digit):
+                            columns.append(consecutive_base + column)
+                    links.add_row(encode_row(i, j, digit), columns)
+        return links
+
+    def solve(self, puzzle: Puzzle) -> Optional[Puzzle]:
+        links = self.build(puzzle)
+        links.on_node = self.make_on_node()
+        if not links.search():
+            return None
+
+        solution = puzzle_copy(puzzle)
+        for row_id in links.solution:
+            i, j, digit = decode_row(row_id)
+            solution[i][j] = digit
+        return solution
+
+    def solutions(self, puzzle: Puzzle, limit: int) -> List[Puzzle]:
+        links = self.build(puzzle)
+        links.on_node = self.make_on_node()
+        solutions = []
+
+        def on_solution():
+            solution = puzzle_copy(puzzle)
+            for row_id in links.solution:
+                i, j, digit = decode_row(row_id)
+                solution[i][j] = digit
+            solutions.append(solution)
+            return len(solutions) >= limit
+
+        links.on_solution = on_solution
+        links.search()
+        return solutions
+
+    def make_on_node(self) -> Callable[[], None]:
+        budget = self.budget
+        if budget is not None:
+            def on_node():
+                budget.check()
+                self.metrics.collect("Solve DLX")
+            return on_node
+
+        def on_node():
+            self.metrics.collect("Solve DLX")
+        return on_node
@@ -0,0 +1,163 @@
+import heapq
+from typing import Callable, List, Optional, Tuple
+
+from .candidates import Candidates
+from .helpers import count_empty
+from .types import Puzzle
+
+# (depth, puzzle, row_ix, col_ix)
+Node = Tuple[int, Puzzle, int, int]
+
+
+class FrontierFull(Exception):
+    pass
+
+
+class Frontier:
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = max_size
+        self.peak_size = 0
+
+    def push(self, node: Node):
+        raise NotImplementedError
+
+    def pop(self) -> Node:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def items(self) -> List[Node]:
+        raise NotImplementedError
+
+    def state(self) -> dict:
+        # Everything but the callables, for checkpoints
+        return {name: value for name, value in vars(self).items()
+                if not callable(value)}
+
+    def restore(self, state: dict):
+        vars(self).update(state)
+
+    def _grow(self, size: int):
+        if self.max_size is not None and size > self.max_size:
+            raise FrontierFull(f"Frontier exceeded {self.max_size} nodes")
+        if size > self.peak_size:
+            self.peak_size = size
+
+
+class LifoFrontier(Frontier):
+    # Depth first search
+    def __init__(self, max_size: Optional[int] = None):
+        super().__init__(max_size)
+        self.stack = []
+
+    def push(self, node: Node):
+        self.stack.append(node)
+        self._grow(len(self.stack))
+
+    def pop(self) -> Node:
+        return self.stack.pop()
+
+    def __len__(self) -> int:
+        return len(self.stack)
+
+    def items(self) -> List[Node]:
+        return list(self.stack)
+
+
+def filled_priority(node: Node):
+    # Fewer empty cells first
+    return count_empty(node[1])
+
+
+def make_domain_priority(make_candidates: Callable[[Puzzle], Candidates]):
+    def domain_priority(node: Node):
+        # Smallest domain first, then fewer empty cells
+        candidates = make_candidates(node[1])
+        row_ix, col_ix = candidates.best_cell()
+        if row_ix >= 9:
+            return 0, 0
+        return candidates.count(row_ix, col_ix), filled_priority(node)
+    return domain_priority
+
+
+class BestFirstFrontier(Frontier):
+    # Best first by priority, ties go to the most recent node. When the
+    # memory cap is reached the worst half of the frontier is dropped, so
+    # a bounded search may miss solutions (see `evicted`).
+    def __init__(self, priority: Callable[[Node], object],
+                 max_size: Optional[int] = None):
+        super().__init__(max_size)
+        self.priority = priority
+        self.heap = []
+        self.counter = 0
+        self.evicted = 0
+
+    def push(self, node: Node):
+        self.counter += 1
+        heapq.heappush(self.heap, (self.priority(node), -self.counter, node))
+        if self.max_size is not None and len(self.heap) > self.max_size:
+            keep = max(1, self.max_size // 2)
+            self.evicted += len(self.heap) - keep
+            self.heap = heapq.nsmallest(keep, self.heap)
+        if len(self.heap) > self.peak_size:
+            self.peak_size = len(self.heap)
+
+    def pop(self) -> Node:
+        return heapq.heappop(self.heap)[2]
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def items(self) -> List[Node]:
+        return [entry[2] for entry in self.heap]
+
+
+class DepthFrontier(Frontier):
+    # One stack per depth. Alternates between sweeping the stacks from
+    # the shallowest up, one node each, and draining the deepest stack
+    # for 81 pops (the schedule of the original solve_smart).
+    def __init__(self, max_size: Optional[int] = None):
+        super().__init__(max_size)
+        self.stacks = [[] for _ in range(81 + 1)]
+        self.size = 0
+        self.iter_counter = 1
+        self.iter_start = 0
+        self.stack_counter = 0
+
+    def push(self, node: Node):
+        self.stacks[node[0]].append(node)
+        self.size += 1
+        self._grow(self.size)
+
+    def pop(self) -> Node:
+        while True:
+            if self.iter_counter > 0:
+                self.iter_counter -= 1
+                if self.iter_counter == 0:
+                    self.iter_start = 0
+                    self.stack_counter = 81
+                for i, stack in enumerate(self.stacks):
+                    if i >= self.iter_start and len(stack) > 0:
+                        break
+                self.iter_start = i + 1
+                if self.iter_start >= 81:
+                    self.iter_start = 0
+                    self.iter_counter = 0
+                    self.stack_counter = 81
+                    continue
+            else:
+                self.stack_counter -= 1
+                if self.stack_counter == 0:
+                    self.iter_counter = 81
+                for stack in reversed(self.stacks):
+                    if len(stack) > 0:
+                        break
+            self.size -= 1
+            return stack.pop()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def items(self) -> List[Node]:
+        return [node for stack in self.stacks for node in stack]
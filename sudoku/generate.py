@@ -0,0 +1,160 @@
+import concurrent.futures
+import random
+from typing import Iterator, List, Optional, Tuple
+
+from .candidates import Candidates
+from .config import SolverConfig, make_solver
+from .helpers import puzzle_to_line
+from .logger import Logger
+from .metrics import Metrics
+from .propagation import Propagation
+from .solver import Solver
+from .types import Game
+
+# (seed, puzzle as 81 digits, clues, nodes)
+Generated = Tuple[int, str, int, int]
+
+# Uniqueness checks need a search that goes on past a solution
+GENERATE_CONFIG = SolverConfig(next_step="mrv", propagation=True,
+                               solve_type="inplace")
+
+# Nodes of the first random fill attempt
+FILL_BUDGET = 200
+
+# Per process state, set by init_generate_worker
+worker_template: Optional[Game] = None
+worker_clues: Optional[int] = None
+
+
+class FillBudget(Exception):
+    pass
+
+
+def random_fill(candidates: Candidates, rng: random.Random,
+                propagation: Optional[Propagation] = None,
+                budget: List[int] = None) -> bool:
+    # Fills every empty cell, smallest domain first, digits in random order.
+    # budget is a one item list of nodes left, FillBudget is raised when
+    # it runs out.
+    if budget is not None:
+        budget[0] -= 1
+        if budget[0] < 0:
+            raise FillBudget()
+    if propagation is not None and not propagation.propagate(candidates):
+        return False
+    row_ix, col_ix = candidates.best_cell()
+    if row_ix >= 9:
+        return True
+    digits = list(candidates.digits(row_ix, col_ix))
+    rng.shuffle(digits)
+    for digit in digits:
+        mark = len(candidates.trail)
+        candidates.assign(row_ix, col_ix, digit)
+        if random_fill(candidates, rng, propagation, budget):
+            return True
+        candidates.undo(mark)
+    return False
+
+
+def random_fill_restarts(candidates: Candidates, rng: random.Random,
+                         propagation: Optional[Propagation] = None,
+                         budget: int = FILL_BUDGET) -> bool:
+    # Random orders have heavy tailed run times on constrained variants
+    # (no consecutive digits), so the fill restarts with a doubled budget
+    # instead of digging out of a bad early choice
+    mark = len(candidates.trail)
+    while True:
+        try:
+            return random_fill(candidates, rng, propagation, [budget])
+        except FillBudget:
+            candidates.undo(mark)
+            budget *= 2
+
+
+def has_other_solution(solver: Solver, candidates: Candidates,
+                       row_ix: int, col_ix: int, digit: int) -> bool:
+    # Whether the empty cell can hold anything but digit in a solution.
+    # Works on the candidates of the current puzzle and leaves them as
+    # they were, so no state is rebuilt between removals.
+    for other in candidates.digits(row_ix, col_ix):
+        if other == digit:
+            continue
+        mark = len(candidates.trail)
+        candidates.assign(row_ix, col_ix, other)
+        found = next(solver.iter_candidates_solutions(candidates), None)
+        candidates.undo(mark)
+        if found is not None:
+            return True
+    return False
+
+
+def generate_game(template: Game, rng: random.Random, solver: Solver,
+                  clues: Optional[int] = None) -> Optional[Game]:
+    # A full grid under the template rules, then clues are removed in
+    # random order while the solution stays unique, down to `clues` when
+    # given. The template digits are kept as clues.
+    candidates = solver.collect_next_steps.candidates(
+        [row.copy() for row in template.puzzle])
+    if not random_fill_restarts(candidates, rng, solver.propagation):
+        return None
+
+    puzzle = candidates.puzzle
+    cells = [(i, j) for i in range(9) for j in range(9)
+             if template.puzzle[i][j] == 0]
+    rng.shuffle(cells)
+    filled = 81
+    for row_ix, col_ix in cells:
+        if clues is not None and filled <= clues:
+            break
+        digit = puzzle[row_ix][col_ix]
+        mark = len(candidates.trail)
+        candidates.assign(row_ix, col_ix, 0)
+        if has_other_solution(solver, candidates, row_ix, col_ix, digit):
+            candidates.undo(mark)
+        else:
+            filled -= 1
+
+    return Game([row.copy() for row in puzzle], template.cages, template.rules)
+
+
+def generate_one(template: Game, seed: int,
+                 clues: Optional[int] = None) -> Optional[Generated]:
+    metrics = Metrics()
+    solver = make_solver(GENERATE_CONFIG, template, metrics, Logger(1e10))
+    game = generate_game(template, random.Random(seed), solver, clues)
+    if game is None:
+        return None
+    count = sum(cell != 0 for row in game.puzzle for cell in row)
+    return seed, puzzle_to_line(game.puzzle), count, metrics.nodes()
+
+
+def init_generate_worker(template: Game, clues: Optional[int]):
+    global worker_template, worker_clues
+    worker_template = template
+    worker_clues = clues
+
+
+def generate_worker(seed: int) -> Optional[Generated]:
+    return generate_one(worker_template, seed, worker_clues)
+
+
+def generate_games(template: Game, count: int, seed: int = 0,
+                   clues: Optional[int] = None,
+                   workers: int = 1) -> Iterator[Optional[Generated]]:
+    # Puzzle k comes from seed + k, so the output does not depend on the
+    # number of workers
+    seeds = range(seed, seed + count)
+    if workers <= 1:
+        for puzzle_seed in seeds:
+            yield generate_one(template, puzzle_seed, clues)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=init_generate_worker,
+            initargs=(template, clues)) as executor:
+        yield from executor.map(generate_worker, seeds)
+
+
+def format_generated(generated: Generated) -> str:
+    seed, puzzle, clues, nodes = generated
+    return f"{puzzle}\t{clues}\t{seed}\t{nodes}"
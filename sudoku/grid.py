@@ -0,0 +1,81 @@
+from typing import Tuple, Union
+
+from .types import Puzzle
+
+# Flat puzzle: 81 cells in row major order, one byte per cell. Copies are a
+# single allocation and grids hash and serialize as bytes.
+Grid = bytearray
+
+CELL_INDEX = [[i * 9 + j for j in range(9)] for i in range(9)]
+CELL_ROW = tuple(cell // 9 for cell in range(81))
+CELL_COL = tuple(cell % 9 for cell in range(81))
+CELL_BLOCK = tuple((cell // 27) * 3 + (cell % 9) // 3 for cell in range(81))
+
+ROW_CELLS = tuple(tuple(i * 9 + j for j in range(9)) for i in range(9))
+COL_CELLS = tuple(tuple(i * 9 + j for i in range(9)) for j in range(9))
+BLOCK_CELLS = tuple(tuple(cell for cell in range(81) if CELL_BLOCK[cell] == block_ix)
+                    for block_ix in range(9))
+UNIT_CELLS = ROW_CELLS + COL_CELLS + BLOCK_CELLS
+
+# The 20 cells sharing a row, column or block with each cell
+PEERS = tuple(tuple(sorted(set(ROW_CELLS[CELL_ROW[cell]]) |
+                           set(COL_CELLS[CELL_COL[cell]]) |
+                           set(BLOCK_CELLS[CELL_BLOCK[cell]]) - {cell}))
+              for cell in range(81))
+ADJACENT_CELLS = tuple(tuple((CELL_ROW[cell] + di) * 9 + CELL_COL[cell] + dj
+                             for di, dj in [(-1, 0), (1, 0), (0, -1), (0, 1)]
+                             if 0 <= CELL_ROW[cell] + di < 9
+                             and 0 <= CELL_COL[cell] + dj < 9)
+                       for cell in range(81))
+
+# Cell values to and from their ascii digits
+TO_ASCII = bytes.maketrans(bytes(range(10)), b"0123456789")
+FROM_ASCII = bytes.maketrans(b".0123456789", bytes([0]) + bytes(range(10)))
+
+
+def is_grid(puzzle: Union[Puzzle, Grid]) -> bool:
+    return isinstance(puzzle, (bytearray, bytes))
+
+
+def grid_from_puzzle(puzzle: Puzzle) -> Grid:
+    return bytearray(cell for row in puzzle for cell in row)
+
+
+def grid_to_puzzle(grid: Grid) -> Puzzle:
+    return [list(grid[i * 9:i * 9 + 9]) for i in range(9)]
+
+
+def grid_rows(grid: Grid) -> Puzzle:
+    # Writable row views, so nested puzzle code can work on a grid in place
+    view = memoryview(grid)
+    return [view[i * 9:i * 9 + 9] for i in range(9)]
+
+
+def grid_copy(grid: Grid) -> Grid:
+    return bytearray(grid)
+
+
+def grid_from_line(line: str) -> Grid:
+    line = line.strip()
+    if len(line) != 81:
+        raise ValueError("Puzzle line must have 81 cells")
+    grid = bytearray(line.encode().translate(FROM_ASCII))
+    if max(grid) > 9:
+        raise ValueError("Puzzle line cells must be digits or '.'")
+    return grid
+
+
+def grid_to_line(grid: Grid) -> str:
+    return bytes(grid).translate(TO_ASCII).decode()
+
+
+def grid_count_empty(grid: Grid) -> int:
+    return grid.count(0)
+
+
+def grid_cell(row_ix: int, col_ix: int) -> int:
+    return row_ix * 9 + col_ix
+
+
+def grid_coord(cell: int) -> Tuple[int, int]:
+    return CELL_ROW[cell], CELL_COL[cell]
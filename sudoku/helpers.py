@@ -1,7 +1,9 @@
 
 import functools
+from pathlib import Path
 from typing import List, Tuple
 
+from .grid import grid_copy, grid_to_line, grid_to_puzzle, is_grid
 from .types import Blocks, Cage, Game, Puzzle
 
 blocks_indexes = [
@@ -35,7 +37,24 @@ def check_values_is_complete(values: List[int]):
     return all(x != 0 for x in values)
 
 
+def puzzle_rows(puzzle: Puzzle) -> Puzzle:
+    # Nested form of a puzzle or flat grid
+    if is_grid(puzzle):
+        return grid_to_puzzle(puzzle)
+    return puzzle
+
+
+def count_empty(puzzle: Puzzle) -> int:
+    if is_grid(puzzle):
+        return puzzle.count(0)
+    if isinstance(puzzle[0], memoryview):
+        # Row views of a grid (see grid_rows)
+        return sum(row.tobytes().count(0) for row in puzzle)
+    return sum(row.count(0) for row in puzzle)
+
+
 def check_puzzle_is_valid(puzzle: Puzzle):
+    puzzle = puzzle_rows(puzzle)
     rows = (row for row in puzzle)
     cols = ([puzzle[i][j] for i in range(9)] for j in range(9))
     blocks = (collect_puzzle_block(puzzle, block_ix) for block_ix in range(9))
@@ -45,6 +64,8 @@ def check_puzzle_is_valid(puzzle: Puzzle):
 
 
 def check_puzzle_is_solution(puzzle: Puzzle, solution: Puzzle):
+    puzzle = puzzle_rows(puzzle)
+    solution = puzzle_rows(solution)
     return (
         check_puzzle_is_complete(solution) and
         check_puzzle_is_valid(solution) and
@@ -101,10 +122,13 @@ def collect_puzzle_blocks(puzzle: Puzzle, block_ix: int) -> Blocks:
 
 
 def check_puzzle_is_complete(puzzle: Puzzle):
+    if is_grid(puzzle):
+        return 0 not in puzzle
     return all(map(check_values_is_complete, puzzle))
 
 
 def why_is_invalid(puzzle: Puzzle):
+    puzzle = puzzle_rows(puzzle)
     print("Rows: ")
     for i in range(9):
         row = puzzle[i]
@@ -151,6 +175,20 @@ def puzzle_from_csv(file_path: str) -> Puzzle:
         return puzzle
 
 
+def puzzle_from_line(line: str) -> Puzzle:
+    line = line.strip()
+    if len(line) != 81:
+        raise ValueError("Puzzle line must have 81 cells")
+    cells = [0 if cell == '.' else int(cell) for cell in line]
+    return [cells[i * 9:i * 9 + 9] for i in range(9)]
+
+
+def puzzle_to_line(puzzle: Puzzle) -> str:
+    if is_grid(puzzle):
+        return grid_to_line(puzzle)
+    return ''.join(str(cell) for row in puzzle for cell in row)
+
+
 def puzzle_from_txt(filename: str) -> Game:
     puzzle = []
     cages = []
@@ -184,12 +222,66 @@ def puzzle_from_txt(filename: str) -> Game:
     return Game(puzzle, cages, rules)
 
 
+def puzzle_to_csv(puzzle: Puzzle, file_path: Path):
+    with open(file_path, "w") as f:
+        for row in puzzle_rows(puzzle):
+            f.write(", ".join(str(cell) for cell in row) + "\n")
+
+
+def game_to_txt(game: Game, file_path: Path):
+    with open(file_path, "w") as f:
+        f.write("puzzle:\n")
+        for row in puzzle_rows(game.puzzle):
+            f.write(", ".join(str(cell) for cell in row) + "\n")
+        f.write("\nrules:\n")
+        for rule in game.rules:
+            f.write(rule + "\n")
+        if len(game.cages) > 0:
+            f.write("\ncages:\n")
+            for cage in game.cages:
+                f.write(" ; ".join(f"{i},{j}" for i, j in cage) + "\n")
+
+
+def game_to_file(game: Game, file_path: Path):
+    # Plain games fit a .csv, the others need a .txt with rules and cages
+    if file_path.suffix == ".csv":
+        if game.rules != ["normal rules"] or len(game.cages) > 0:
+            raise ValueError(f"Only normal rules games fit a .csv: {file_path}")
+        puzzle_to_csv(game.puzzle, file_path)
+    elif file_path.suffix == ".txt":
+        game_to_txt(game, file_path)
+    else:
+        raise ValueError(f"Unknown file type: {file_path}")
+
+
+def check_puzzle_shape(puzzle: Puzzle) -> bool:
+    return len(puzzle) == 9 and all(
+        len(row) == 9 and all(0 <= cell <= 9 for cell in row)
+        for row in puzzle)
+
+
+def game_from_file(file_path: Path) -> Game:
+    if file_path.suffix == ".csv":
+        puzzle = puzzle_from_csv(file_path)
+        rules = ["normal rules"]
+        game = Game(puzzle, [], rules)
+    elif file_path.suffix == ".txt":
+        game = puzzle_from_txt(file_path)
+    else:
+        raise ValueError(f"Unknown file type: {file_path}")
+    if not check_puzzle_shape(game.puzzle):
+        raise ValueError("Puzzle must have 9 rows of 9 cells in 0..9")
+    return game
+
+
 def puzzle_display2(puzzle: Puzzle):
+    puzzle = puzzle_rows(puzzle)
     for row in puzzle:
         print(*row, sep=", ")
 
 
 def puzzle_display(puzzle: Puzzle):
+    puzzle = puzzle_rows(puzzle)
     print('-------------------------')
     for x in range(9):
         print(end='| ')
@@ -207,6 +299,8 @@ def puzzle_display(puzzle: Puzzle):
 
 
 def puzzle_copy(puzzle: Puzzle) -> Puzzle:
+    if type(puzzle) is bytearray:
+        return grid_copy(puzzle)
     return [row.copy() for row in puzzle]
 
 
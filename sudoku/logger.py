@@ -1,6 +1,10 @@
+import json
+import sys
+import threading
+import time
 from datetime import datetime
 
-from .helpers import puzzle_display
+from .helpers import count_empty, puzzle_display, puzzle_to_line
 
 
 class Logger:
@@ -21,6 +25,10 @@ class Logger:
         if self.count % self.interval == 0:
             self.display(puzzle)
 
+    def watch(self, stack, puzzle):
+        # Open nodes and root puzzle of the running search, for progress
+        pass
+
     def info(self, message):
         print(f"Logger: {message}")
 
@@ -29,3 +37,88 @@ class Logger:
         print(
             f"Logger: {self.count} iterations in {current_time - self.start_time}")
         puzzle_display(puzzle)
+
+
+class ProgressReporter(Logger):
+    # Emits one JSON line every `interval` seconds from a background thread.
+    # The solver only stores the current node; the thread samples it every
+    # SAMPLE_INTERVAL seconds to follow the depth.
+    SAMPLE_INTERVAL = 0.05
+
+    def __init__(self, interval: float = 5.0, stream=None) -> None:
+        super().__init__(interval)
+        self.stream = stream if stream is not None else sys.stderr
+        self.current = None
+        self.stack = ()
+        self.clues = 0
+        self.max_depth = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        super().start()
+        self.start_counter = time.perf_counter()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def end(self):
+        super().end()
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.emit("done")
+
+    def puzzle(self, puzzle):
+        self.count += 1
+        self.current = puzzle
+
+    def watch(self, stack, puzzle):
+        self.stack = stack
+        self.clues = 81 - count_empty(puzzle)
+
+    def depth(self, puzzle) -> int:
+        # Cells filled since the root
+        return 81 - count_empty(puzzle) - self.clues
+
+    def sample(self):
+        puzzle = self.current
+        if puzzle is None:
+            return None
+        depth = self.depth(puzzle)
+        if depth > self.max_depth:
+            self.max_depth = depth
+        return depth
+
+    def run(self):
+        last_time = time.perf_counter()
+        last_count = self.count
+        next_emit = last_time + self.interval
+        while not self.stop_event.wait(min(self.SAMPLE_INTERVAL, self.interval)):
+            self.sample()
+            now = time.perf_counter()
+            if now < next_emit:
+                continue
+            count = self.count
+            self.emit("progress", (count - last_count) / (now - last_time))
+            last_time, last_count = now, count
+            next_emit = now + self.interval
+
+    def emit(self, event, nodes_per_sec=None):
+        elapsed = time.perf_counter() - self.start_counter
+        if nodes_per_sec is None:
+            nodes_per_sec = self.count / elapsed if elapsed > 0 else 0.0
+        puzzle = self.current
+        depth = self.sample()
+        self.stream.write(json.dumps({
+            "event": event,
+            "elapsed": round(elapsed, 3),
+            "nodes": self.count,
+            "nodes_per_sec": round(nodes_per_sec, 1),
+            "stack": len(self.stack),
+            "depth": depth,
+            "max_depth": self.max_depth,
+            "grid": puzzle_to_line(puzzle) if puzzle is not None else None,
+        }) + "\n")
+        self.stream.flush()
@@ -1,27 +1,85 @@
-
+import csv
+import json
 from collections import defaultdict
-from datetime import datetime
+from datetime import timedelta
+from time import perf_counter_ns
 
-METRIC_DISPLAY_INTERVAL = 1e10  # 5000
-# METRIC_DISPLAY_INTERVAL = 5000
+# Values past the last bin are counted in it
+HISTOGRAM_BINS = 81 + 1
 
 
 class Metrics:
-    def __init__(self) -> None:
+    def __init__(self, timing: bool = False, histograms: bool = False) -> None:
+        # Timers and histograms are opt-in, when disabled nothing on the
+        # hot path checks for them (see Solver.__init__)
         self.values = defaultdict(int)
+        self.timing = timing
+        self.histograms = histograms
+        self.timers = defaultdict(int)
+        self.timer_counts = defaultdict(int)
+        self.histogram_values = {}
         self.start_time = None
         self.end_time = None
 
     def start(self):
-        self.start_time = datetime.now()
+        self.start_time = perf_counter_ns()
 
     def end(self):
-        self.end_time = datetime.now()
+        self.end_time = perf_counter_ns()
 
     def collect(self, name):
         self.values[name] += 1
-        if self.values[name] % METRIC_DISPLAY_INTERVAL == 0:
-            self.display()
+
+    def add(self, name, value):
+        self.values[name] += value
+
+    def observe(self, name, value):
+        bins = self.histogram_values.get(name)
+        if bins is None:
+            bins = self.histogram_values[name] = [0] * HISTOGRAM_BINS
+        bins[min(value, HISTOGRAM_BINS - 1)] += 1
+
+    def timed(self, name, func):
+        timers = self.timers
+        timer_counts = self.timer_counts
+
+        def timed_func(*args):
+            start = perf_counter_ns()
+            result = func(*args)
+            timers[name] += perf_counter_ns() - start
+            timer_counts[name] += 1
+            return result
+        return timed_func
+
+    def state(self):
+        # Counters and the time so far, for checkpoints
+        elapsed = 0
+        if self.start_time is not None:
+            elapsed = perf_counter_ns() - self.start_time
+        return {
+            "values": dict(self.values),
+            "timers": dict(self.timers),
+            "timer_counts": dict(self.timer_counts),
+            "histogram_values": self.histogram_values,
+            "elapsed_ns": elapsed,
+        }
+
+    def restore(self, state):
+        self.values.update(state["values"])
+        self.timers.update(state["timers"])
+        self.timer_counts.update(state["timer_counts"])
+        self.histogram_values.update(state["histogram_values"])
+        if self.start_time is not None:
+            self.start_time -= state["elapsed_ns"]
+
+    def nodes(self):
+        return sum(value for name, value in self.values.items()
+                   if name.startswith("Solve"))
+
+    def duration_ns(self):
+        if self.end_time and self.start_time:
+            return self.end_time - self.start_time
+        return None
 
     def display(self):
         values = self.get_values()
@@ -32,8 +90,58 @@ class Metrics:
         for name, value in values.items():
             print(template.format(name=name, value=value))
 
+        for name, total in self.timers.items():
+            count = self.timer_counts[name]
+            print(f"    {name}: {total / 1e6:.3f}ms in {count} calls, "
+                  f"{total / count:.0f}ns per call")
+
+        for name, bins in self.histogram_values.items():
+            counts = ", ".join(f"{value}: {count}"
+                               for value, count in enumerate(bins) if count)
+            print(f"    {name}: {counts}")
+
     def get_values(self):
         values = dict(self.values)
-        if self.end_time and self.start_time:
-            values["Duration"] = self.end_time - self.start_time
+        duration = self.duration_ns()
+        if duration is not None:
+            values["Duration"] = timedelta(microseconds=duration / 1000)
         return values
+
+    def to_dict(self):
+        return {
+            "values": dict(self.values),
+            "duration_ns": self.duration_ns(),
+            "timers": {name: {"total_ns": total,
+                              "count": self.timer_counts[name]}
+                       for name, total in self.timers.items()},
+            "histograms": {name: {value: count
+                                  for value, count in enumerate(bins) if count}
+                           for name, bins in self.histogram_values.items()},
+        }
+
+    def export_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def export_csv(self, path):
+        # One row per value: kind, name, key, value
+        data = self.to_dict()
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["kind", "name", "key", "value"])
+            for name, value in data["values"].items():
+                writer.writerow(["value", name, "", value])
+            if data["duration_ns"] is not None:
+                writer.writerow(["value", "Duration", "ns", data["duration_ns"]])
+            for name, timer in data["timers"].items():
+                writer.writerow(["timer", name, "total_ns", timer["total_ns"]])
+                writer.writerow(["timer", name, "count", timer["count"]])
+            for name, bins in data["histograms"].items():
+                for value, count in bins.items():
+                    writer.writerow(["histogram", name, value, count])
+
+    def export(self, path):
+        if str(path).endswith(".csv"):
+            self.export_csv(path)
+        else:
+            self.export_json(path)
@@ -1,14 +1,17 @@
 from collections import defaultdict
 from typing import List
 
-from .helpers import collect_puzzle_block, compute_block_index, remove_zeros
+from .candidates import POPCOUNT, Candidates
+from .helpers import compute_block_index
 from .types import Coord, Puzzle
 
 
 class NextStep:
-    def __init__(self, next_step_func, start=(0, 0)):
+    def __init__(self, next_step_func, start=(0, 0), select=None):
         self.next_step_func = next_step_func
         self.start = start
+        # Dynamic orders pick the cell when the node is expanded
+        self.select = select
 
     def next(self, row_ix: int, col_ix: int):
         return self.next_step_func(row_ix, col_ix)
@@ -60,30 +63,26 @@ def make_compute_next_step_block_row(_puzzle: Puzzle):
 
 
 def compute_best_path_next_step2(puzzle: Puzzle) -> List[Coord]:
-    blocks = [set(remove_zeros(collect_puzzle_block(puzzle, i)))
-              for i in range(9)]
-    rows = [set(remove_zeros(puzzle[i]))
-            for i in range(9)]
-    cols = [set(remove_zeros([puzzle[i][j]for i in range(9)]))
-            for j in range(9)]
-    options = [(set(range(1, 10)) - blocks[compute_block_index(i, j)] - rows[i] - cols[j], (i, j))
+    candidates = Candidates(puzzle)
+    options = [(candidates.count(i, j), (i, j))
                for i in range(9)
                for j in range(9)]
     options.sort(key=lambda pair: (compute_block_index(
-        pair[1][0], pair[1][1]), len(pair[0])))
+        pair[1][0], pair[1][1]), pair[0]))
     return [pair[1] for pair in options]
 
 
 def compute_best_path_next_step1(puzzle: Puzzle) -> List[Coord]:
-    blocks_sizes = sorted([(len(remove_zeros(collect_puzzle_block(puzzle, block_ix))), block_ix)
+    candidates = Candidates(puzzle)
+    blocks_sizes = sorted([(POPCOUNT[candidates.blocks[block_ix]], block_ix)
                            for block_ix in range(9)])
     blocks = [pair[1] for pair in blocks_sizes]
 
-    rows_sizes = sorted([(len(remove_zeros(puzzle[row_ix])), row_ix)
+    rows_sizes = sorted([(POPCOUNT[candidates.rows[row_ix]], row_ix)
                          for row_ix in range(9)])
     rows = [pair[1] for pair in sorted(rows_sizes)]
 
-    cols_sizes = sorted([(len(remove_zeros([puzzle[i][col_ix] for i in range(9)])), col_ix)
+    cols_sizes = sorted([(POPCOUNT[candidates.cols[col_ix]], col_ix)
                          for col_ix in range(9)])
     cols = [pair[1] for pair in sorted(cols_sizes)]
 
@@ -136,6 +135,18 @@ make_compute_next_step_heuristic2 = _make_compute_next_step_heuristic(
     compute_best_path_next_step2)
 
 
+def compute_next_step_mrv(_row_ix: int, _col_ix: int):
+    return 0, 0
+
+
+def select_next_step_mrv(candidates: Candidates) -> Coord:
+    return candidates.best_cell()
+
+
+def make_compute_next_step_mrv(_puzzle: Puzzle):
+    return NextStep(compute_next_step_mrv, select=select_next_step_mrv)
+
+
 def _create_sequence_1():
     # 1)
     # 1 1 1 _ _ _ _ _ _
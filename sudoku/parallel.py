@@ -0,0 +1,134 @@
+import concurrent.futures
+import multiprocessing
+import os
+from collections import deque
+from typing import List, Optional, Tuple
+
+from .budget import Budget, BudgetExhausted
+from .config import SolverConfig, make_solver
+from .logger import Logger
+from .metrics import Metrics
+from .solver import Solver
+from .types import Game, Puzzle
+
+Node = Tuple[Puzzle, int, int]
+
+SOLVED = "solved"
+DEAD = "dead"
+SPLIT = "split"
+CANCELLED = "cancelled"
+
+STOP_CHECK_INTERVAL = 1024
+# Seconds between looks at the budget while waiting for the workers
+BUDGET_POLL_INTERVAL = 0.1
+
+# Per process state, set by init_worker
+worker_solver: Optional[Solver] = None
+worker_stop = None
+
+
+def expand_node(solver: Solver, node: Node) -> Tuple[Optional[Puzzle], List[Node]]:
+    puzzle, row_ix, col_ix = node
+    cell = solver.prepare(puzzle, row_ix, col_ix)
+    if cell is None:
+        return None, []
+    row_ix, col_ix = cell
+    if row_ix >= 9 or col_ix >= 9:
+        return puzzle, []
+
+    solver.metrics.collect("Solve Processes")
+    solver.logger.puzzle(puzzle)
+
+    next_row_ix, next_col_ix = solver.next_step.next(row_ix, col_ix)
+    if next_row_ix == -1 and next_col_ix == -1:
+        # Infeasible
+        return None, []
+
+    if solver.is_filled(puzzle, row_ix, col_ix):
+        return None, [(puzzle, next_row_ix, next_col_ix)]
+
+    return None, solver.collect(puzzle, row_ix, col_ix, next_row_ix, next_col_ix)
+
+
+def init_worker(config: SolverConfig, game: Game, stop):
+    global worker_solver, worker_stop
+    worker_solver = make_solver(config, game, Metrics(), Logger(1e10))
+    worker_stop = stop
+
+
+def solve_subtree(node: Node, max_nodes: int):
+    # Depth first search below node, giving back the unexplored part of
+    # the subtree when it grows past max_nodes so it can be re-split
+    solver = worker_solver
+    solver.metrics.values.clear()
+    stack = [node]
+    iterations = 0
+    while len(stack) > 0:
+        iterations += 1
+        if iterations % STOP_CHECK_INTERVAL == 0 and worker_stop.is_set():
+            return CANCELLED, None, dict(solver.metrics.values)
+        if iterations > max_nodes:
+            return SPLIT, stack, dict(solver.metrics.values)
+
+        solution, nexts = expand_node(solver, stack.pop())
+        if solution is not None:
+            return SOLVED, solution, dict(solver.metrics.values)
+        stack.extend(nexts)
+    return DEAD, None, dict(solver.metrics.values)
+
+
+def solve_processes(config: SolverConfig, game: Game, metrics: Metrics,
+                    workers: Optional[int] = None,
+                    split_nodes: int = 100_000,
+                    budget: Optional[Budget] = None) -> Optional[Puzzle]:
+    # The budget is checked per node here and between subtrees for the
+    # workers, so they may go past max_nodes by up to a subtree each
+    workers = workers or os.cpu_count()
+    solver = make_solver(config, game, metrics, Logger(1e10))
+    start = solver.next_step.start
+
+    # Breadth first until every worker has a few subtrees to start with
+    frontier = deque([(solver.root(game.puzzle), start[0], start[1])])
+    while len(frontier) > 0 and len(frontier) < workers * 4:
+        if budget is not None:
+            budget.check()
+        solution, nexts = expand_node(solver, frontier.popleft())
+        if solution is not None:
+            return solver.result(solution, game.puzzle)
+        frontier.extend(reversed(nexts))
+
+    context = multiprocessing.get_context()
+    stop = context.Event()
+    solution = None
+    reason = None
+    timeout = None if budget is None else BUDGET_POLL_INTERVAL
+    with concurrent.futures.ProcessPoolExecutor(
+            workers, mp_context=context,
+            initializer=init_worker, initargs=(config, game, stop)) as executor:
+        pending = {executor.submit(solve_subtree, node, split_nodes)
+                   for node in frontier}
+        while len(pending) > 0 and solution is None and reason is None:
+            done, pending = concurrent.futures.wait(
+                pending, timeout,
+                return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                status, payload, values = future.result()
+                for name, value in values.items():
+                    metrics.add(name, value)
+                if status == SOLVED:
+                    solution = payload
+                    break
+                elif status == SPLIT:
+                    for node in reversed(payload):
+                        pending.add(executor.submit(
+                            solve_subtree, node, split_nodes))
+            if budget is not None:
+                reason = budget.exhausted(metrics.nodes())
+
+        stop.set()
+        for future in pending:
+            future.cancel()
+
+    if reason is not None and solution is None:
+        raise BudgetExhausted(reason)
+    return solver.result(solution, game.puzzle)
@@ -0,0 +1,88 @@
+from .candidates import (ALL_DIGITS_MASK, DIGIT_MASK, LOWEST_DIGIT, POPCOUNT,
+                         Candidates)
+from .metrics import Metrics
+
+
+def naked_singles(candidates: Candidates) -> int:
+    # Returns the number of cells filled, or -1 on a contradiction
+    puzzle = candidates.puzzle
+    filled = 0
+    changed = True
+    while changed:
+        changed = False
+        for i, row in enumerate(puzzle):
+            for j in range(9):
+                if row[j] != 0:
+                    continue
+                options = candidates.options(i, j)
+                if options == 0:
+                    return -1
+                if POPCOUNT[options] == 1:
+                    candidates.assign(i, j, LOWEST_DIGIT[options])
+                    filled += 1
+                    changed = True
+    return filled
+
+
+def hidden_singles(candidates: Candidates) -> int:
+    # Returns the number of cells filled, or -1 on a contradiction
+    puzzle = candidates.puzzle
+    filled = 0
+    for unit in candidates.units:
+        placed = 0
+        seen_once = 0
+        seen_twice = 0
+        for i, j in unit:
+            value = puzzle[i][j]
+            if value != 0:
+                placed |= DIGIT_MASK[value]
+                continue
+            options = candidates.options(i, j)
+            seen_twice |= seen_once & options
+            seen_once |= options
+
+        if placed | seen_once != ALL_DIGITS_MASK:
+            return -1
+
+        singles = seen_once & ~seen_twice & ~placed
+        while singles:
+            digit = LOWEST_DIGIT[singles]
+            singles &= singles - 1
+            for i, j in unit:
+                if puzzle[i][j] == 0 and candidates.options(i, j) & DIGIT_MASK[digit]:
+                    candidates.assign(i, j, digit)
+                    filled += 1
+                    break
+            else:
+                # An earlier single took the only place left for this digit
+                return -1
+    return filled
+
+
+class Propagation:
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+
+    def propagate(self, candidates: Candidates) -> bool:
+        filled = 0
+        alive = True
+        while True:
+            count = naked_singles(candidates)
+            if count < 0:
+                alive = False
+                break
+            filled += count
+
+            count = hidden_singles(candidates)
+            if count < 0:
+                alive = False
+                break
+            filled += count
+            if count == 0:
+                break
+
+        if filled > 0:
+            self.metrics.add("Propagation Filled", filled)
+        if not alive:
+            self.metrics.add("Propagation Dead", 1)
+        return alive
@@ -0,0 +1,76 @@
+import mmap
+import os
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from .grid import FROM_ASCII, Grid
+
+
+class PuzzleLine(NamedTuple):
+    # Byte offset of the line, its 1-based number when read from the
+    # start of the file, and the grid or why the line is not a puzzle
+    offset: int
+    number: Optional[int]
+    grid: Optional[Grid]
+    error: Optional[str]
+
+
+def parse_line(line: bytes) -> Tuple[Optional[Grid], Optional[str]]:
+    line = line.strip()
+    if len(line) != 81:
+        return None, f"expected 81 cells, found {len(line)}"
+    grid = bytearray(line.translate(FROM_ASCII))
+    if max(grid) > 9:
+        return None, "cells must be digits or '.'"
+    return grid, None
+
+
+def byte_ranges(path: Path, count: int) -> List[Tuple[int, int]]:
+    # Splits the file in count ranges of about the same size. A line
+    # belongs to the range its first byte is in, see iter_puzzle_lines.
+    size = os.path.getsize(path)
+    bounds = [size * i // count for i in range(count + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def iter_puzzle_lines(path: Path, start: int = 0, end: Optional[int] = None,
+                      skip: int = 0,
+                      limit: Optional[int] = None) -> Iterator[PuzzleLine]:
+    # One puzzle per line, 81 cells with '0' or '.' for blanks. The file
+    # is mapped, not read, so memory stays the same whatever its size.
+    # Lines starting in [start, end) are read, after skipping `skip` of
+    # them and up to `limit`. Blank lines are ignored, bad lines are
+    # yielded with an error instead of a grid.
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            end = size if end is None else min(end, size)
+            pos = start
+            if start > 0 and mm[start - 1:start] != b"\n":
+                # Mid line, that line belongs to the previous range
+                pos = mm.find(b"\n", start) + 1
+                if pos == 0:
+                    return
+            number = 0 if start == 0 else None
+
+            count = 0
+            while pos < end and (limit is None or count < limit):
+                next_pos = mm.find(b"\n", pos)
+                if next_pos == -1:
+                    next_pos = size
+                line = mm[pos:next_pos]
+                offset = pos
+                pos = next_pos + 1
+                if number is not None:
+                    number += 1
+
+                if line.strip() == b"":
+                    continue
+                if skip > 0:
+                    skip -= 1
+                    continue
+                count += 1
+                grid, error = parse_line(line)
+                yield PuzzleLine(offset, number, grid, error)
@@ -1,5 +1,7 @@
 from typing import List, Tuple
 
+from .candidates import CONSECUTIVE_MASK, DIGIT_MASK
+from .grid import CELL_COL, CELL_ROW, Grid, grid_rows, is_grid
 from .types import Cage, Puzzle
 
 
@@ -151,7 +153,105 @@ class RuleInfeasible(Rule):
         return True
 
 
+class RuleCompiled(Rule):
+    # Precomputes, for each cell, the peers that must hold a different
+    # digit and the adjacent cells that must not hold a consecutive one,
+    # so a check only visits the constraints touching the placed cell.
+    # Rules that can not be compiled are applied as they are.
+    def __init__(self, rules: List[Rule]):
+        self.rules = rules
+        peers = [[set() for _ in range(9)] for _ in range(9)]
+        adjacents = [[set() for _ in range(9)] for _ in range(9)]
+        self.others = []
+
+        pending = list(rules)
+        while pending:
+            rule = pending.pop(0)
+            if isinstance(rule, RuleAll):
+                pending.extend(rule.rules)
+            elif isinstance(rule, RuleBasic):
+                pending.extend(rule.rules.rules)
+            elif isinstance(rule, RuleHorizontal):
+                for x in range(9):
+                    for y in range(9):
+                        peers[x][y].update((x, i) for i in range(9))
+            elif isinstance(rule, RuleVertical):
+                for x in range(9):
+                    for y in range(9):
+                        peers[x][y].update((i, y) for i in range(9))
+            elif isinstance(rule, RuleBlock):
+                for x in range(9):
+                    for y in range(9):
+                        xx = x // 3 * 3
+                        yy = y // 3 * 3
+                        peers[x][y].update((xx + i, yy + j)
+                                           for i in range(3) for j in range(3))
+            elif isinstance(rule, RuleCage):
+                for x, y in rule.cage:
+                    peers[x][y].update(rule.cage)
+            elif isinstance(rule, RuleConsecutivesOrtogonalAdjacents):
+                for x in range(9):
+                    for y in range(9):
+                        adjacents[x][y].update(
+                            (x + i, y + j)
+                            for i, j in [(-1, 0), (1, 0), (0, -1), (0, 1)]
+                            if 0 <= x + i < 9 and 0 <= y + j < 9)
+            else:
+                self.others.append(rule)
+
+        for x in range(9):
+            for y in range(9):
+                peers[x][y].discard((x, y))
+        self.peers = [[tuple(sorted(cells)) for cells in row] for row in peers]
+        self.adjacents = [[tuple(sorted(cells)) for cells in row]
+                          for row in adjacents]
+        # Same tables over flat cell indexes, for apply_grid
+        self.cell_peers = tuple(tuple(i * 9 + j for i, j in self.peers[x][y])
+                                for x in range(9) for y in range(9))
+        self.cell_adjacents = tuple(tuple(i * 9 + j for i, j in self.adjacents[x][y])
+                                    for x in range(9) for y in range(9))
+
+    def apply(self, puzzle: Puzzle, x: int, y: int) -> bool:
+        value = puzzle[x][y]
+        if value != 0:
+            for i, j in self.peers[x][y]:
+                if puzzle[i][j] == value:
+                    return False
+            consecutive = CONSECUTIVE_MASK[value]
+            for i, j in self.adjacents[x][y]:
+                if DIGIT_MASK[puzzle[i][j]] & consecutive:
+                    return False
+        for rule in self.others:
+            if not rule.apply(puzzle, x, y):
+                return False
+        return True
+
+    def apply_grid(self, grid: Grid, cell: int) -> bool:
+        value = grid[cell]
+        if value != 0:
+            for peer in self.cell_peers[cell]:
+                if grid[peer] == value:
+                    return False
+            consecutive = CONSECUTIVE_MASK[value]
+            for adjacent in self.cell_adjacents[cell]:
+                if DIGIT_MASK[grid[adjacent]] & consecutive:
+                    return False
+        if self.others:
+            puzzle = grid_rows(grid)
+            for rule in self.others:
+                if not rule.apply(puzzle, CELL_ROW[cell], CELL_COL[cell]):
+                    return False
+        return True
+
+    def __str__(self):
+        return 'RuleCompiled({})'.format(', '.join(map(str, self.rules)))
+
+
 def rule_apply_puzzle(rule: Rule, puzzle: Puzzle) -> bool:
+    if is_grid(puzzle):
+        if isinstance(rule, RuleCompiled):
+            return all(rule.apply_grid(puzzle, cell) for cell in range(81))
+        puzzle = grid_rows(puzzle)
     for i in range(9):
         for j in range(9):
             if not rule.apply(puzzle, i, j):
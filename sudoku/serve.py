@@ -0,0 +1,261 @@
+import asyncio
+import concurrent.futures
+import dataclasses
+import json
+import signal
+import sys
+import time
+from collections import defaultdict, deque
+from typing import Dict, List, Tuple
+
+from . import batch
+from .batch import BatchResult, init_batch_worker, solve_batch_item
+from .budget import BUDGET_EXHAUSTED
+from .collect_next_steps import rule_from_game
+from .config import SolverConfig
+from .helpers import check_puzzle_is_valid, puzzle_from_line
+from .store import game_key
+from .types import Game
+
+# Latencies kept for the percentiles of /stats
+LATENCY_WINDOW = 10_000
+MAX_BODY_SIZE = 1 << 20
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    503: "Service Unavailable",
+}
+
+
+class RequestError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def game_from_json(data) -> Game:
+    # {"puzzle": 81 cells or 9 rows of 9, "cages": [[[row, col], ...], ...],
+    #  "rules": [...]}, the fields of Game
+    if not isinstance(data, dict) or "puzzle" not in data:
+        raise RequestError(400, "expected an object with a puzzle")
+    puzzle = data["puzzle"]
+    try:
+        if isinstance(puzzle, str):
+            puzzle = puzzle_from_line(puzzle)
+        elif not (len(puzzle) == 9 and all(len(row) == 9 for row in puzzle)):
+            raise ValueError("Puzzle must have 9 rows of 9 cells")
+        puzzle = [[int(cell) for cell in row] for row in puzzle]
+        if any(not 0 <= cell <= 9 for row in puzzle for cell in row):
+            raise ValueError("Cells must be in 0..9")
+        cages = [[(int(row_ix), int(col_ix)) for row_ix, col_ix in cage]
+                 for cage in data.get("cages", [])]
+        if any(not (0 <= row_ix < 9 and 0 <= col_ix < 9)
+               for cage in cages for row_ix, col_ix in cage):
+            raise ValueError("Cage cells must be in 0..8")
+        rules = [str(rule) for rule in data.get("rules", ["normal rules"])]
+        game = Game(puzzle, cages, rules)
+        rule_from_game(game)
+    except (TypeError, ValueError, AssertionError) as e:
+        raise RequestError(400, str(e) or "invalid game")
+    if not check_puzzle_is_valid(puzzle):
+        raise RequestError(400, "the givens break the normal rules")
+    return game
+
+
+def warm_worker(delay: float) -> None:
+    # Keeps a worker busy long enough for the pool to start the others
+    time.sleep(delay)
+
+
+def solve_request(game: Game, deadline: float) -> BatchResult:
+    # Run in the workers. The deadline is wall clock time, so the time a
+    # request waits for a worker counts against its timeout.
+    timeout = deadline - time.time()
+    if timeout <= 0:
+        return "request", BUDGET_EXHAUSTED, 0, 0.0, ""
+    config = dataclasses.replace(batch.worker_config, timeout=timeout)
+    return solve_batch_item(config, ("request", game))
+
+
+def percentiles(values: List[float], quantiles: List[int]) -> Dict[str, float]:
+    if len(values) == 0:
+        return {}
+    values = sorted(values)
+    return {f"p{q}": values[min(len(values) - 1, len(values) * q // 100)]
+            for q in quantiles}
+
+
+class SolveServer:
+    # Puzzles are solved by a pool of worker processes started up front.
+    # Requests for the same game share one solve, at most max_pending
+    # solves are queued or running and the requests past that get a 503.
+    def __init__(self, config: SolverConfig, workers: int, max_pending: int,
+                 timeout: float):
+        self.config = config
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.executor = None
+        self.pending: Dict[Tuple, asyncio.Future] = {}
+        self.counts = defaultdict(int)
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def start(self):
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            self.workers, initializer=init_batch_worker,
+            initargs=(self.config, solve_batch_item))
+        for future in [self.executor.submit(warm_worker, 0.2)
+                       for _ in range(self.workers)]:
+            future.result()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+    async def solve(self, game: Game, timeout: float) -> Tuple[BatchResult, bool]:
+        # (result, whether it was shared with an earlier request)
+        key = game_key(game) + (timeout,)
+        future = self.pending.get(key)
+        if future is not None:
+            self.counts["coalesced"] += 1
+            return await asyncio.shield(future), True
+        if len(self.pending) >= self.max_pending:
+            raise RequestError(503, f"{self.max_pending} solves pending")
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, solve_request, game,
+                                      time.time() + timeout)
+        self.pending[key] = future
+        future.add_done_callback(lambda _: self.pending.pop(key, None))
+        return await asyncio.shield(future), False
+
+    async def handle_solve(self, body: bytes) -> dict:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            raise RequestError(400, "body is not JSON")
+        game = game_from_json(data)
+        timeout = self.timeout
+        if isinstance(data.get("timeout"), (int, float)):
+            timeout = min(timeout, max(0.0, float(data["timeout"])))
+
+        (_name, status, nodes, duration, solution), coalesced = \
+            await self.solve(game, timeout)
+        self.counts[status] += 1
+        return {
+            "status": status,
+            "nodes": nodes,
+            "duration": duration,
+            "solution": solution or None,
+            "coalesced": coalesced,
+        }
+
+    def stats(self) -> dict:
+        latencies = percentiles(list(self.latencies), [50, 90, 99])
+        return {
+            "requests": self.counts["requests"],
+            "pending": len(self.pending),
+            "workers": self.workers,
+            "counts": {name: value for name, value in self.counts.items()
+                       if name != "requests"},
+            "latency_ms": {name: round(value * 1000, 3)
+                           for name, value in latencies.items()},
+        }
+
+    async def route(self, method: str, path: str, body: bytes) -> Tuple[int, dict]:
+        if path == "/solve":
+            if method != "POST":
+                raise RequestError(405, "use POST")
+            self.counts["requests"] += 1
+            start = time.perf_counter()
+            try:
+                return 200, await self.handle_solve(body)
+            except RequestError as e:
+                # Bad requests and the ones turned away
+                self.counts[f"http {e.status}"] += 1
+                raise
+            finally:
+                self.latencies.append(time.perf_counter() - start)
+        if path == "/stats":
+            if method != "GET":
+                raise RequestError(405, "use GET")
+            return 200, self.stats()
+        raise RequestError(404, f"no {path}")
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter):
+        # HTTP/1.1 with keep alive, enough for JSON requests with a
+        # Content-Length body
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                    keep_alive = keep_alive and version == "HTTP/1.1"
+                    length = int(headers.get("content-length", 0))
+                    if length > MAX_BODY_SIZE:
+                        keep_alive = False
+                        raise RequestError(413, f"body over {MAX_BODY_SIZE} bytes")
+                    body = await reader.readexactly(length) if length > 0 else b""
+                    status, payload = await self.route(
+                        method, target.split("?", 1)[0], body)
+                except RequestError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except ValueError:
+                    keep_alive = False
+                    status, payload = 400, {"error": "malformed request"}
+
+                content = json.dumps(payload).encode()
+                head = [f"HTTP/1.1 {status} {REASONS[status]}",
+                        "Content-Type: application/json",
+                        f"Content-Length: {len(content)}"]
+                if status == 503:
+                    head.append("Retry-After: 1")
+                if not keep_alive:
+                    head.append("Connection: close")
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + content)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        address = server.sockets[0].getsockname()
+        print(f"Serving on http://{address[0]}:{address[1]} with "
+              f"{self.workers} workers", file=sys.stderr, flush=True)
+        # Stops on SIGINT and SIGTERM, the workers are shut down after
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        async with server:
+            await stop.wait()
+
+
+def run_server(config: SolverConfig, host: str, port: int, workers: int,
+               max_pending: int, timeout: float):
+    server = SolveServer(config, workers, max_pending, timeout)
+    server.start()
+    try:
+        asyncio.run(server.serve(host, port))
+    finally:
+        server.close()
@@ -1,10 +1,19 @@
-from typing import Optional
-
-from .collect_next_steps import CollectNextSteps
-from .helpers import puzzle_copy
+from typing import Iterator, Optional
+
+from .budget import Budget, BudgetExhausted
+from .candidates import DIGIT_MASK, LOWEST_DIGIT, POPCOUNT, Candidates
+from .checkpoint import Checkpoint, check_checkpoint
+from .collect_next_steps import (CollectNextSteps,
+                                 make_timed_collect_next_steps)
+from .frontier import (BestFirstFrontier, DepthFrontier, Frontier,
+                       LifoFrontier, filled_priority, make_domain_priority)
+from .grid import grid_copy, grid_from_puzzle, grid_to_puzzle, is_grid
+from .helpers import count_empty, puzzle_copy, puzzle_to_line
 from .logger import Logger
 from .metrics import Metrics
 from .next_step import NextStep
+from .propagation import Propagation
+from .transposition import TranspositionTable
 from .types import Puzzle
 
 
@@ -12,64 +21,315 @@ class Solver:
     def __init__(self, next_step: NextStep,
                  collect_next_steps: CollectNextSteps,
                  metrics: Metrics,
-                 logger: Logger):
+                 logger: Logger,
+                 propagation: Optional[Propagation] = None,
+                 max_frontier: Optional[int] = None,
+                 priority: str = "filled",
+                 flat: bool = False,
+                 transposition: Optional[TranspositionTable] = None):
         self.next_step = next_step
         self.collect_next_steps = collect_next_steps
         self.metrics = metrics
         self.logger = logger
+        self.propagation = propagation
+        self.max_frontier = max_frontier
+        self.priority = priority
+        # Search on flat grids (see grid.py), collect_next_steps must be
+        # a grid collector then
+        self.flat = flat
+        self.transposition = transposition
+        # Set by the caller: where to save the frontier searches, and a
+        # loaded checkpoint to continue from
+        self.checkpoint: Optional[Checkpoint] = None
+        self.resume: Optional[dict] = None
+        # Set by the caller to bound the searches, checked once per node
+        self.budget: Optional[Budget] = None
+
+        if metrics.timing:
+            # Swap in timed copies, so untimed runs pay nothing for it
+            select = next_step.select
+            if select is not None:
+                select = metrics.timed("Phase Next Step", select)
+            self.next_step = NextStep(
+                metrics.timed("Phase Next Step", next_step.next),
+                next_step.start, select)
+            self.collect_next_steps = make_timed_collect_next_steps(
+                collect_next_steps, metrics)
+            if propagation is not None:
+                self.propagation = Propagation(metrics)
+                self.propagation.propagate = metrics.timed(
+                    "Phase Propagation", self.propagation.propagate)
+
+    def root(self, puzzle: Puzzle) -> Puzzle:
+        # Copy of the puzzle in the representation the search runs on
+        if self.flat:
+            return grid_copy(puzzle) if is_grid(puzzle) else grid_from_puzzle(puzzle)
+        return grid_to_puzzle(puzzle) if is_grid(puzzle) else puzzle_copy(puzzle)
+
+    def result(self, solution: Optional[Puzzle], puzzle: Puzzle) -> Optional[Puzzle]:
+        # Solution in the representation of the puzzle given
+        if solution is None or is_grid(solution) == is_grid(puzzle):
+            return solution
+        if is_grid(solution):
+            return grid_to_puzzle(solution)
+        return grid_from_puzzle(solution)
+
+    def is_filled(self, puzzle: Puzzle, row_ix: int, col_ix: int) -> bool:
+        if self.flat:
+            return puzzle[row_ix * 9 + col_ix] != 0
+        return puzzle[row_ix][col_ix] != 0
+
+    def prepare(self, puzzle: Puzzle, row_ix: int, col_ix: int):
+        # Runs propagation and dynamic cell selection on an expanded node,
+        # returns None when the node is a dead end
+        if self.propagation is None and self.next_step.select is None:
+            return row_ix, col_ix
+        candidates = self.collect_next_steps.candidates(puzzle)
+        if self.propagation is not None and not self.propagation.propagate(candidates):
+            return None
+        if self.next_step.select is not None:
+            return self.next_step.select(candidates)
+        return row_ix, col_ix
+
+    def first_expansion(self, puzzle: Puzzle) -> bool:
+        # Searches on copies stop at their first solution, so a state
+        # expanded before is either refuted or still waiting in the frontier
+        candidates = self.collect_next_steps.candidates(puzzle)
+        if candidates.infeasible():
+            return False
+        key = candidates.zobrist()
+        if key in self.transposition:
+            return False
+        self.transposition.add(key)
+        return True
+
+    def collect(self, puzzle: Puzzle,
+                row_ix: int, col_ix: int,
+                next_row_ix: int, next_col_ix: int):
+        nexts = self.collect_next_steps.collect(
+            puzzle, row_ix, col_ix, next_row_ix, next_col_ix)
+        if self.propagation is not None:
+            self.metrics.add("Branching Filled", len(nexts))
+        if self.metrics.histograms:
+            self.metrics.observe("Branching", len(nexts))
+        return nexts
 
     def solve_recursive(self, puzzle: Puzzle) -> Optional[Puzzle]:
-        def go(puzzle, row_ix, col_ix):
+        histograms = self.metrics.histograms
+        transposition = self.transposition
+        budget = self.budget
+
+        def go(puzzle, row_ix, col_ix, depth):
+            cell = self.prepare(puzzle, row_ix, col_ix)
+            if cell is None:
+                return
+            row_ix, col_ix = cell
             if row_ix >= 9 or col_ix >= 9:
                 return puzzle
 
+            if budget is not None:
+                budget.check()
             self.metrics.collect("Solve Recursive")
             self.logger.puzzle(puzzle)
+            if histograms:
+                self.metrics.observe("Depth", depth)
 
             next_row_ix, next_col_ix = self.next_step.next(row_ix, col_ix)
             if next_row_ix == -1 and next_col_ix == -1:
                 # Infeasible
                 return
 
-            if puzzle[row_ix][col_ix] != 0:
-                return go(puzzle, next_row_ix, next_col_ix)
+            if self.is_filled(puzzle, row_ix, col_ix):
+                return go(puzzle, next_row_ix, next_col_ix, depth)
+            if transposition is not None and not self.first_expansion(puzzle):
+                return
 
-            nexts = self.collect_next_steps.collect(
+            nexts = self.collect(
                 puzzle, row_ix, col_ix, next_row_ix, next_col_ix)
 
             for next_puzzle, next_row_ix, next_col_ix in nexts:
-                solution_puzzle = go(next_puzzle, next_row_ix, next_col_ix)
+                solution_puzzle = go(
+                    next_puzzle, next_row_ix, next_col_ix, depth + 1)
                 if solution_puzzle:
                     return solution_puzzle
 
         start = self.next_step.start
-        return go(puzzle, start[0], start[1])
-
-    def solve_iterative(self, puzzle: Puzzle) -> Optional[Puzzle]:
+        return self.result(go(self.root(puzzle), start[0], start[1], 0), puzzle)
+
+    def search_state(self, puzzle: Puzzle, frontier: Frontier,
+                     name: str) -> dict:
+        slots = self.transposition.slots if self.transposition is not None else None
+        return {
+            "name": name,
+            "puzzle": puzzle_to_line(puzzle),
+            "frontier": frontier.state(),
+            "metrics": self.metrics.state(),
+            "transposition": slots,
+        }
+
+    def restore_search(self, state: dict, puzzle: Puzzle, frontier: Frontier,
+                       name: str):
+        check_checkpoint(state, name, puzzle_to_line(puzzle))
+        frontier.restore(state["frontier"])
+        self.metrics.restore(state["metrics"])
+        if self.transposition is not None and state["transposition"] is not None:
+            self.transposition.slots = state["transposition"]
+            self.transposition.size = len(state["transposition"])
+
+    def solve_frontier(self, puzzle: Puzzle, frontier: Frontier,
+                       name: str) -> Optional[Puzzle]:
         start = self.next_step.start
-        stack = [(puzzle_copy(puzzle), start[0], start[1])]
-
-        while len(stack) > 0:
-            puzzle, row_ix, col_ix = stack.pop()
+        root = self.root(puzzle)
+        if self.resume is not None:
+            self.restore_search(self.resume, puzzle, frontier, name)
+        else:
+            frontier.push((0, root, start[0], start[1]))
+        self.logger.watch(frontier, root)
+        histograms = self.metrics.histograms
+        flat = self.flat
+        transposition = self.transposition
+        checkpoint = self.checkpoint
+        budget = self.budget
+
+        solution = None
+        while len(frontier) > 0:
+            if checkpoint is not None and checkpoint.due():
+                checkpoint.save(self.search_state(puzzle, frontier, name))
+            depth, node, row_ix, col_ix = frontier.pop()
+            cell = self.prepare(node, row_ix, col_ix)
+            if cell is None:
+                continue
+            row_ix, col_ix = cell
             if row_ix >= 9 or col_ix >= 9:
+                solution = node
                 break
 
-            self.metrics.collect("Solve Iterative DFS")
-            self.logger.puzzle(puzzle)
+            if budget is not None:
+                budget.check()
+            self.metrics.collect(name)
+            self.logger.puzzle(node)
+            if histograms:
+                self.metrics.observe("Depth", depth)
 
             next_row_ix, next_col_ix = self.next_step.next(row_ix, col_ix)
             if next_row_ix == -1 and next_col_ix == -1:
                 # Infeasible
                 continue
 
-            if puzzle[row_ix][col_ix] != 0:
-                stack.append((puzzle, next_row_ix, next_col_ix))
+            if (node[row_ix * 9 + col_ix] if flat else node[row_ix][col_ix]) != 0:
+                frontier.push((depth, node, next_row_ix, next_col_ix))
+                continue
+            if transposition is not None and not self.first_expansion(node):
                 continue
 
-            stack.extend(self.collect_next_steps.collect(
-                puzzle, row_ix, col_ix, next_row_ix, next_col_ix))
+            for next_puzzle, next_row_ix, next_col_ix in self.collect(
+                    node, row_ix, col_ix, next_row_ix, next_col_ix):
+                frontier.push(
+                    (depth + 1, next_puzzle, next_row_ix, next_col_ix))
 
-        return puzzle
+        if isinstance(frontier, BestFirstFrontier) and frontier.evicted > 0:
+            self.metrics.add("Frontier Evicted", frontier.evicted)
+        if checkpoint is not None:
+            # The search is over, nothing to resume
+            checkpoint.remove()
+        return self.result(solution, puzzle)
+
+    def make_priority(self):
+        if self.priority == "domain":
+            return make_domain_priority(self.collect_next_steps.candidates)
+        return filled_priority
+
+    def solve_iterative(self, puzzle: Puzzle) -> Optional[Puzzle]:
+        return self.solve_frontier(
+            puzzle, LifoFrontier(self.max_frontier), "Solve Iterative DFS")
+
+    def solve_inplace(self, puzzle: Puzzle) -> Optional[Puzzle]:
+        return next(self.iter_solutions(puzzle), None)
+
+    def iter_solutions(self, puzzle: Puzzle) -> Iterator[Puzzle]:
+        candidates = self.collect_next_steps.candidates(self.root(puzzle))
+        for solution in self.iter_candidates_solutions(candidates):
+            yield self.result(solution, puzzle)
+
+    def iter_candidates_solutions(self, candidates: Candidates) -> Iterator[Puzzle]:
+        # In place search that keeps backtracking after each solution.
+        # Solutions are nested copies; candidates is left mid search, undo
+        # to the trail length from before to restore it.
+        # Nested view of the puzzle, grids are wrapped by Candidates
+        rows = candidates.puzzle
+        trail = candidates.trail
+        # Frames: [row_ix, col_ix, next_row_ix, next_col_ix, options, mark,
+        #          solutions before the frame]
+        stack = []
+        self.logger.watch(stack, rows)
+        row_ix, col_ix = self.next_step.start
+        histograms = self.metrics.histograms
+        transposition = self.transposition
+        budget = self.budget
+        solutions = 0
+        if transposition is not None:
+            candidates.hash_domains()
+
+        if self.propagation is not None and not self.propagation.propagate(candidates):
+            return
+        if candidates.infeasible():
+            return
+
+        while True:
+            if self.next_step.select is not None:
+                row_ix, col_ix = self.next_step.select(candidates)
+            if row_ix >= 9 or col_ix >= 9:
+                solutions += 1
+                yield [list(row) for row in rows]
+                next_row_ix, next_col_ix = -1, -1
+            else:
+                if budget is not None:
+                    budget.check()
+                self.metrics.collect("Solve Inplace")
+                self.logger.puzzle(rows)
+                if histograms:
+                    self.metrics.observe("Depth", len(stack))
+                next_row_ix, next_col_ix = self.next_step.next(row_ix, col_ix)
+
+            if next_row_ix == -1 and next_col_ix == -1:
+                # Infeasible, or a solution to backtrack from
+                pass
+            elif rows[row_ix][col_ix] != 0:
+                row_ix, col_ix = next_row_ix, next_col_ix
+                continue
+            else:
+                options = candidates.options(row_ix, col_ix)
+                stack.append([row_ix, col_ix, next_row_ix, next_col_ix,
+                              options, len(trail), solutions])
+                if self.propagation is not None:
+                    self.metrics.add("Branching Filled", POPCOUNT[options])
+                if histograms:
+                    self.metrics.observe("Branching", POPCOUNT[options])
+
+            while len(stack) > 0:
+                frame = stack[-1]
+                candidates.undo(frame[5])
+                options = frame[4]
+                if options == 0:
+                    stack.pop()
+                    if transposition is not None and frame[6] == solutions:
+                        # Every option failed, the state is refuted
+                        transposition.add(candidates.zobrist())
+                    continue
+                option = LOWEST_DIGIT[options]
+                frame[4] = options & ~DIGIT_MASK[option]
+                candidates.assign(frame[0], frame[1], option)
+                if self.propagation is not None and not self.propagation.propagate(candidates):
+                    continue
+                if candidates.infeasible():
+                    self.metrics.add("Infeasible Dead", 1)
+                    continue
+                if transposition is not None and candidates.zobrist() in transposition:
+                    continue
+                row_ix, col_ix = frame[2], frame[3]
+                break
+            else:
+                return
 
     def solve_threads(self, puzzle: Puzzle) -> Optional[Puzzle]:
         import heapq
@@ -90,6 +350,11 @@ class Solver:
                     return
 
                 puzzle, row_ix, col_ix = args
+                cell = self.prepare(puzzle, row_ix, col_ix)
+                if cell is None:
+                    queue_output.put((None, []))
+                    continue
+                row_ix, col_ix = cell
                 if row_ix >= 9 or col_ix >= 9:
                     queue_output.put((puzzle, None))
                     return
@@ -102,17 +367,18 @@ class Solver:
                     queue_output.put((None, None))
                     return
 
-                if puzzle[row_ix][col_ix] != 0:
+                if self.is_filled(puzzle, row_ix, col_ix):
                     queue_input.put((puzzle, next_row_ix, next_col_ix))
                     continue
 
-                nexts = self.collect_next_steps.collect(
+                nexts = self.collect(
                     puzzle, row_ix, col_ix, next_row_ix, next_col_ix)
                 queue_output.put((None, nexts))
 
         class HeapItem(tuple):
             def __lt__(self, other):
-                return self[0].count(0) < other[0].count(0)
+                # Fewer empty cells means closer to a solution
+                return count_empty(self[0]) < count_empty(other[0])
 
         threads = []
 
@@ -133,17 +399,24 @@ class Solver:
             for thread in threads:
                 queue_input.put(None)
 
-        queue_input.put((puzzle_copy(puzzle), start[0], start[1]))
+        given = puzzle
+        queue_input.put((self.root(puzzle), start[0], start[1]))
         heap = []
         count = 1
 
         while True:
             puzzle, nexts = queue_output.get()
             count -= 1
+            if self.budget is not None:
+                try:
+                    self.budget.check()
+                except BudgetExhausted:
+                    stop_threads()
+                    raise
 
             if puzzle is not None:
                 stop_threads()
-                return puzzle
+                return self.result(puzzle, given)
 
             if nexts is not None:
                 for it in nexts:
@@ -157,11 +430,16 @@ class Solver:
 
     def solve_interative(self, puzzle: Puzzle) -> Optional[Puzzle]:
         start = self.next_step.start
-        stack = [(puzzle_copy(puzzle), start[0], start[1])]
+        frontier = LifoFrontier(self.max_frontier)
+        frontier.push((0, self.root(puzzle), start[0], start[1]))
 
-        while len(stack) > 0:
-            puzzle, row_ix, col_ix = stack.pop()
-            yield puzzle, row_ix, col_ix, stack
+        while len(frontier) > 0:
+            depth, puzzle, row_ix, col_ix = frontier.pop()
+            cell = self.prepare(puzzle, row_ix, col_ix)
+            if cell is None:
+                continue
+            row_ix, col_ix = cell
+            yield puzzle, row_ix, col_ix, frontier
 
             if row_ix >= 9 or col_ix >= 9:
                 break
@@ -174,113 +452,21 @@ class Solver:
                 # Infeasible
                 continue
 
-            if puzzle[row_ix][col_ix] != 0:
-                stack.append((puzzle, next_row_ix, next_col_ix))
+            if self.is_filled(puzzle, row_ix, col_ix):
+                frontier.push((depth, puzzle, next_row_ix, next_col_ix))
                 continue
 
-            stack.extend(self.collect_next_steps.collect(
-                puzzle, row_ix, col_ix, next_row_ix, next_col_ix))
+            for next_puzzle, next_row_ix, next_col_ix in self.collect(
+                    puzzle, row_ix, col_ix, next_row_ix, next_col_ix):
+                frontier.push(
+                    (depth + 1, next_puzzle, next_row_ix, next_col_ix))
 
         return puzzle
 
     def solve_smart(self, puzzle: Puzzle) -> Optional[Puzzle]:
-        start = self.next_step.start
-        stacks = [[] for _ in range(81 + 1)]
-
-        stacks[0].append((0, puzzle_copy(puzzle), start[0], start[1]))
-
-        iter_counter = 1
-        iter_start = 0
-        stack_counter = 0
-
-        while True:
-            stack = None
-            if iter_counter > 0:
-                iter_counter -= 1
-                if iter_counter == 0:
-                    iter_start = 0
-                    stack_counter = 81
-                for i, stack in enumerate(stacks):
-                    if i >= iter_start and len(stack) > 0:
-                        break
-                iter_start = i + 1
-                if iter_start >= 81:
-                    iter_start = 0
-                    iter_counter = 0
-                    stack_counter = 81
-                    continue
-            else:
-                stack_counter -= 1
-                if stack_counter == 0:
-                    iter_counter = 81
-                for stack in reversed(stacks):
-                    if len(stack) > 0:
-                        break
-
-            if stack is None:
-                break
-
-            depth, puzzle, row_ix, col_ix = stack.pop()
-            if row_ix >= 9 or col_ix >= 9:
-                break
-
-            self.metrics.collect("Solve Smart")
-            self.logger.puzzle(puzzle)
-
-            next_row_ix, next_col_ix = self.next_step.next(row_ix, col_ix)
-            if next_row_ix == -1 and next_col_ix == -1:
-                # Infeasible
-                continue
-            
-            if puzzle[row_ix][col_ix] != 0:
-                stacks[depth].append((depth, puzzle, next_row_ix, next_col_ix))
-                continue
-            
-            nexts = self.collect_next_steps.collect(
-                puzzle, row_ix, col_ix, next_row_ix, next_col_ix)
-            for next_puzzle, next_row_ix, next_col_ix in nexts:
-                stacks[depth + 1].append((depth + 1, next_puzzle, next_row_ix, next_col_ix))
-
-        return puzzle
+        return self.solve_frontier(
+            puzzle, DepthFrontier(self.max_frontier), "Solve Smart")
 
     def solve_iterative_bfs(self, puzzle: Puzzle) -> Optional[Puzzle]:
-        # TODO: Not working properly
-
-        start = self.next_step.start
-        stacks = [[] for _ in range(81)]
-
-        stacks[stack_position(puzzle)].append(
-            (puzzle_copy(puzzle), start[0], start[1]))
-
-        found = True
-        while found:
-            found = False
-            for k, stack in enumerate(stacks):
-                if len(stack) == 0:
-                    continue
-                found = True
-
-                puzzle, row_ix, col_ix = stack.pop()
-                if row_ix >= 9 or col_ix >= 9:
-                    break
-
-                self.metrics.collect("Solve Iterative BFS")
-                self.logger.puzzle(puzzle)
-
-                next_row_ix, next_col_ix = self.next_step.next(row_ix, col_ix)
-                if next_row_ix == -1 and next_col_ix == -1:
-                    # Infeasible
-                    continue
-
-                if puzzle[row_ix][col_ix] != 0:
-                    stack.append((puzzle, next_row_ix, next_col_ix))
-                    continue
-
-                stacks[stack_position(puzzle)].extend(self.collect_next_steps.collect(
-                    puzzle, row_ix, col_ix, next_row_ix, next_col_ix))
-
-        return puzzle
-
-
-def stack_position(puzzle: Puzzle) -> int:
-    return sum(cell != 0 for row in puzzle for cell in row)
+        frontier = BestFirstFrontier(self.make_priority(), self.max_frontier)
+        return self.solve_frontier(puzzle, frontier, "Solve Iterative BFS")
@@ -1,16 +1,22 @@
 import time
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
-from .helpers import cage_assert, puzzle_display, puzzle_from_txt
+from .budget import Budget
+from .checkpoint import Checkpoint, check_checkpoint
+from .helpers import (cage_assert, puzzle_display, puzzle_from_txt,
+                      puzzle_to_line)
 from .next_step import (NextStep, make_compute_next_step,
                         make_compute_next_step_block_column,
                         make_compute_next_step_block_row)
-from .rules import (Rule, RuleBlock, RuleCage,
+from .rules import (Rule, RuleBlock, RuleCage, RuleCompiled,
                     RuleConsecutivesOrtogonalAdjacents, RuleHorizontal,
                     RuleVertical)
 from .types import Cage, Puzzle
 
 
+# Still rescans the grid: a Rule gets no place/undo to update counts on,
+# and this one only feeds make_compute_next_step_smart. The incremental
+# version is candidates.Domains, used by the inplace search.
 class RuleInfeasible(Rule):
     def __init__(self, solver):
         self.solver = solver
@@ -72,13 +78,16 @@ class PuzzleSolver:
         self.puzzle = puzzle
         self.next_step = next_step
         self.rules = []
+        self.compiled = RuleCompiled(self.rules)
         self.stack = []
+        self.given = puzzle_to_line(puzzle)
 
     def add_rule(self, rule: Rule):
         self.rules.append(rule)
+        self.compiled = RuleCompiled(self.rules)
 
     def check(self, x: int, y: int) -> bool:
-        return all(rule.apply(self.puzzle, x, y) for rule in self.rules)
+        return self.compiled.apply(self.puzzle, x, y)
 
     def _next_xy(self, x: int, y: int) -> (int, int):
         return self.next_step.next(x, y)
@@ -127,10 +136,40 @@ class PuzzleSolver:
 
         return False
 
-    def solve(self) -> bool:
-        self.solve_init()
+    def state(self) -> dict:
+        return {
+            "name": "Solve V2",
+            "puzzle": self.given,
+            "rows": [list(row) for row in self.puzzle],
+            "stack": list(self.stack),
+        }
+
+    def restore(self, state: dict):
+        check_checkpoint(state, "Solve V2", self.given)
+        # The puzzle is solved in place, keep the caller's rows
+        for row, saved in zip(self.puzzle, state["rows"]):
+            row[:] = saved
+        self.stack = list(state["stack"])
+
+    def solve(self, checkpoint: Optional[Checkpoint] = None,
+              resume: Optional[dict] = None,
+              budget: Optional[Budget] = None) -> bool:
+        # A step is a node for the budget
+        if resume is not None:
+            self.restore(resume)
+        else:
+            self.solve_init()
+        if checkpoint is None and budget is None:
+            while not self.solve_next():
+                pass
+            return
         while not self.solve_next():
-            pass
+            if budget is not None:
+                budget.check()
+            if checkpoint is not None and checkpoint.due():
+                checkpoint.save(self.state())
+        if checkpoint is not None:
+            checkpoint.remove()
 
 
 def make_compute_next_step_smart(solver: PuzzleSolver) -> NextStep:
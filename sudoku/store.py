@@ -0,0 +1,73 @@
+import hashlib
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .helpers import puzzle_to_line
+from .types import Game, Puzzle
+
+# (puzzle as 81 digits, fingerprint of the rules and cages)
+StoreKey = Tuple[str, str]
+
+
+class StoredSolution(NamedTuple):
+    solution: str
+    nodes: int
+    duration: float
+
+
+def game_fingerprint(game: Game) -> str:
+    # "infeasible" only changes how the search goes, not the solutions
+    rules = sorted(rule for rule in game.rules if rule != "infeasible")
+    cages = sorted(sorted(tuple(cell) for cell in cage) for cage in game.cages)
+    text = repr((rules, cages))
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+def game_key(game: Game) -> StoreKey:
+    return puzzle_to_line(game.puzzle), game_fingerprint(game)
+
+
+class SolutionStore:
+    # Solutions on disk, in a SQLite file. Only solved puzzles are kept:
+    # a puzzle left unsolved under a node or frontier limit may have one.
+    def __init__(self, path: Path):
+        self.connection = sqlite3.connect(str(path))
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS solutions ("
+            "puzzle TEXT NOT NULL, fingerprint TEXT NOT NULL, "
+            "solution TEXT NOT NULL, nodes INTEGER NOT NULL, "
+            "duration REAL NOT NULL, PRIMARY KEY (puzzle, fingerprint)"
+            ") WITHOUT ROWID")
+        self.connection.execute(
+            "CREATE TEMP TABLE lookup (puzzle TEXT, fingerprint TEXT)")
+        self.connection.commit()
+
+    def get(self, game: Game) -> Optional[StoredSolution]:
+        return self.get_many([game_key(game)]).get(game_key(game))
+
+    def get_many(self, keys: Iterable[StoreKey]) -> Dict[StoreKey, StoredSolution]:
+        # One query for all the keys, through a temporary table instead of
+        # a statement with a parameter per key
+        with self.connection:
+            self.connection.execute("DELETE FROM lookup")
+            self.connection.executemany(
+                "INSERT INTO lookup VALUES (?, ?)", keys)
+            rows = self.connection.execute(
+                "SELECT puzzle, fingerprint, solution, nodes, duration "
+                "FROM lookup JOIN solutions USING (puzzle, fingerprint)")
+            return {(puzzle, fingerprint): StoredSolution(solution, nodes, duration)
+                    for puzzle, fingerprint, solution, nodes, duration in rows}
+
+    def put(self, game: Game, solution: Puzzle, nodes: int, duration: float):
+        self.put_many([(game_key(game), StoredSolution(
+            puzzle_to_line(solution), nodes, duration))])
+
+    def put_many(self, entries: List[Tuple[StoreKey, StoredSolution]]):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?)",
+                [key + tuple(stored) for key, stored in entries])
+
+    def close(self):
+        self.connection.close()
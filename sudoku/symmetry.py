@@ -0,0 +1,193 @@
+import itertools
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from .helpers import puzzle_rows
+from .metrics import Metrics
+from .types import Game, Puzzle
+
+# (transpose, rows, cols, digits): cell (i, j) of the transformed puzzle
+# is digits[puzzle[rows[i]][cols[j]]], on the transposed puzzle when
+# transpose is set. digits[0] is 0, empty cells stay empty.
+Transform = Tuple[bool, Tuple[int, ...], Tuple[int, ...], Tuple[int, ...]]
+
+# Ties kept per row. Only nearly empty puzzles have more, their forms may
+# then differ between copies, which costs cache hits but not correctness.
+MAX_PARTIALS = 5000
+
+
+def is_standard_game(game: Game) -> bool:
+    # Relabeling digits and moving lines only keeps the plain rules
+    return game.rules == ["normal rules"] and len(game.cages) == 0
+
+
+def apply_transform(puzzle: Puzzle, transform: Transform) -> Puzzle:
+    transpose, rows, cols, digits = transform
+    puzzle = puzzle_rows(puzzle)
+    if transpose:
+        puzzle = [list(col) for col in zip(*puzzle)]
+    return [[digits[puzzle[row_ix][col_ix]] for col_ix in cols]
+            for row_ix in rows]
+
+
+def invert_transform(transform: Transform) -> Transform:
+    transpose, rows, cols, digits = transform
+    inverse_rows = tuple(rows.index(i) for i in range(9))
+    inverse_cols = tuple(cols.index(j) for j in range(9))
+    inverse_digits = tuple(digits.index(digit) for digit in range(10))
+    if transpose:
+        return True, inverse_cols, inverse_rows, inverse_digits
+    return False, inverse_rows, inverse_cols, inverse_digits
+
+
+def first_row_orders(row: List[int]) -> Tuple[Tuple[bool, ...], List[Tuple[int, ...]]]:
+    # Empty cells first: stacks with more empty cells first, then the
+    # empty cells of each stack. Returns the filled pattern (the smaller
+    # the more empty cells up front) and every column order that gives it.
+    stacks = [[col_ix for col_ix in range(3 * stack, 3 * stack + 3)
+               if row[col_ix] == 0] for stack in range(3)]
+    filled = [[col_ix for col_ix in range(3 * stack, 3 * stack + 3)
+               if row[col_ix] != 0] for stack in range(3)]
+    sizes = sorted((len(empty) for empty in stacks), reverse=True)
+    pattern = tuple(i >= size for size in sizes for i in range(3))
+
+    orders = []
+    for stack_order in itertools.permutations(range(3)):
+        if [len(stacks[stack]) for stack in stack_order] != sizes:
+            continue
+        inside = [[empty + rest
+                   for empty in itertools.permutations(stacks[stack])
+                   for rest in itertools.permutations(filled[stack])]
+                  for stack in stack_order]
+        for cols in itertools.product(*inside):
+            orders.append(tuple(col_ix for stack in cols for col_ix in stack))
+    return pattern, orders
+
+
+def relabel_row(row: List[int], cols: Tuple[int, ...],
+                digits: Tuple[int, ...], next_digit: int):
+    # Digits seen for the first time take the next labels, in order
+    values = []
+    new = {}
+    for col_ix in cols:
+        value = row[col_ix]
+        label = digits[value]
+        if value != 0 and label == 0:
+            label = new.get(value)
+            if label is None:
+                label = new[value] = next_digit
+                next_digit += 1
+        values.append(label)
+    return tuple(values), new, next_digit
+
+
+def canonical_form(puzzle: Puzzle) -> Tuple[str, Transform]:
+    # The smallest puzzle, row by row, over transposition, band and stack
+    # swaps, line swaps inside them and digit relabeling (by first
+    # appearance). Partial transforms are kept only while they tie, so
+    # only the ties of a puzzle's symmetries are carried along.
+    puzzle = puzzle_rows(puzzle)
+    grids = [[list(row) for row in puzzle],
+             [list(col) for col in zip(*puzzle)]]
+
+    best_pattern = None
+    firsts = []
+    for transpose, grid in enumerate(grids):
+        for row_ix, row in enumerate(grid):
+            pattern, orders = first_row_orders(row)
+            if best_pattern is None or pattern < best_pattern:
+                best_pattern = pattern
+                firsts = []
+            if pattern == best_pattern:
+                firsts.append((transpose, row_ix, orders))
+
+    # Partial transforms: (transpose, rows, cols, digits, next_digit)
+    partials = []
+    for transpose, row_ix, orders in firsts:
+        row = grids[transpose][row_ix]
+        for cols in orders:
+            _values, new, next_digit = relabel_row(row, cols, (0,) * 10, 1)
+            digits = [0] * 10
+            for value, label in new.items():
+                digits[value] = label
+            partials.append((transpose, (row_ix,), cols, tuple(digits),
+                             next_digit))
+    partials = partials[:MAX_PARTIALS]
+
+    for line_ix in range(1, 9):
+        best = None
+        ties = []
+        for transpose, rows, cols, digits, next_digit in partials:
+            if line_ix % 3 == 0:
+                bands = {row_ix // 3 for row_ix in rows}
+                options = [row_ix for row_ix in range(9)
+                           if row_ix // 3 not in bands]
+            else:
+                band = rows[-1] // 3
+                options = [row_ix for row_ix in range(3 * band, 3 * band + 3)
+                           if row_ix not in rows]
+            grid = grids[transpose]
+            for row_ix in options:
+                values, new, next_label = relabel_row(
+                    grid[row_ix], cols, digits, next_digit)
+                if best is None or values < best:
+                    best = values
+                    ties = []
+                if values == best:
+                    ties.append((transpose, rows, cols, digits, row_ix, new,
+                                 next_label))
+
+        # Ties that differ only in the order of the rows taken so far
+        # continue the same way, one of them is enough
+        partials = {}
+        for transpose, rows, cols, digits, row_ix, new, next_digit in ties:
+            if new:
+                digits = list(digits)
+                for value, label in new.items():
+                    digits[value] = label
+                digits = tuple(digits)
+            rows = rows + (row_ix,)
+            key = (transpose, cols, digits, frozenset(rows), row_ix // 3)
+            if key not in partials:
+                partials[key] = (transpose, rows, cols, digits, next_digit)
+        partials = list(partials.values())[:MAX_PARTIALS]
+
+    transpose, rows, cols, digits, next_digit = partials[0]
+    # Digits missing from the puzzle take the labels left, in order
+    digits = list(digits)
+    for value in range(1, 10):
+        if digits[value] == 0:
+            digits[value] = next_digit
+            next_digit += 1
+    transform = (bool(transpose), rows, cols, tuple(digits))
+    canonical = apply_transform(puzzle, transform)
+    return "".join(str(value) for row in canonical for value in row), transform
+
+
+class SolutionCache:
+    # Least recently used map from canonical puzzles to their canonical
+    # solutions, so relabeled and reordered copies of a puzzle are solved
+    # once. Only standard games are cached.
+    def __init__(self, size: int):
+        self.size = size
+        self.solutions = OrderedDict()
+
+    def get(self, game: Game, metrics: Metrics) -> Tuple[Optional[str], Optional[Transform], Optional[Puzzle]]:
+        # (key, transform, solution), the key is None for games that are
+        # not cached and the solution is None on a miss
+        if not is_standard_game(game):
+            return None, None, None
+        key, transform = canonical_form(game.puzzle)
+        solution = self.solutions.get(key)
+        if solution is None:
+            metrics.collect("Cache Misses")
+            return key, transform, None
+        metrics.collect("Cache Hits")
+        self.solutions.move_to_end(key)
+        return key, transform, apply_transform(solution, invert_transform(transform))
+
+    def put(self, key: str, transform: Transform, solution: Puzzle):
+        self.solutions[key] = apply_transform(solution, transform)
+        self.solutions.move_to_end(key)
+        if len(self.solutions) > self.size:
+            self.solutions.popitem(last=False)
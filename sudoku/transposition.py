@@ -0,0 +1,49 @@
+import random
+from typing import List
+
+from .metrics import Metrics
+
+# Zobrist keys per cell and candidate mask. A state is keyed by the
+# domains of its empty cells: with the rules this solver has (all
+# different groups, no consecutive neighbours) they decide the rest of
+# the search, whatever digits lead there. Mask 0 keys to 0, so filled
+# cells do not count and a solved grid keys to 0, which is never stored.
+# Fixed seed, so keys are the same in every process.
+_rng = random.Random(81)
+ZOBRIST_KEYS: List[List[int]] = [
+    [0] + [_rng.getrandbits(64) for _ in range(1, 1 << 9)]
+    for _ in range(81)]
+
+DEFAULT_SIZE = 1 << 20
+
+
+def zobrist_domains(domains: List[int]) -> int:
+    key = 0
+    for cell, mask in enumerate(domains):
+        key ^= ZOBRIST_KEYS[cell][mask]
+    return key
+
+
+class TranspositionTable:
+    # Keys of refuted states (or already expanded, for the searches that
+    # stop at the first solution). One slot per key % size and a new key
+    # always replaces the old one, so the memory is bounded and a lost
+    # entry only costs a search again. Keys are 64 bit, a collision would
+    # wrongly prune a state.
+    def __init__(self, metrics: Metrics, size: int = DEFAULT_SIZE):
+        self.metrics = metrics
+        self.size = size
+        self.slots = [0] * size
+
+    def __contains__(self, key: int) -> bool:
+        if key != 0 and self.slots[key % self.size] == key:
+            self.metrics.collect("Transposition Hits")
+            return True
+        self.metrics.collect("Transposition Misses")
+        return False
+
+    def add(self, key: int):
+        slot = key % self.size
+        if self.slots[slot] != 0 and self.slots[slot] != key:
+            self.metrics.collect("Transposition Replaced")
+        self.slots[slot] = key
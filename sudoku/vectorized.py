@@ -0,0 +1,165 @@
+import itertools
+import time
+from typing import Iterable, Iterator, List, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:
+    # Optional, only solve-batch --vectorized needs it
+    np = None
+
+from .batch import (GIVENS_ERROR, Answered, BatchItem, BatchResult,
+                    solve_batch)
+from .config import SolverConfig
+from .grid import grid_from_puzzle, grid_to_line, grid_to_puzzle
+from .symmetry import is_standard_game
+from .types import Game
+
+# Puzzles propagated together
+VECTOR_CHUNK = 4096
+
+OPEN = 0
+SOLVED = 1
+DEAD = 2
+# The givens already hold a digit twice in a unit
+INVALID = 3
+
+
+def require_numpy():
+    if np is None:
+        raise ValueError("The vectorized engine needs numpy (pip install numpy)")
+
+
+def unit_view(values):
+    # (N, 9, 9, ...) to (N, 3, 3, 3, 3, ...): band, row in the band, stack,
+    # column in the stack, so each unit is two axes. The same memory, the
+    # (N, 9, 9, 9) candidates are (N, 3, 3, 3, 3, 9) here.
+    return values.reshape((len(values), 3, 3, 3, 3) + values.shape[3:])
+
+
+def any_per_puzzle(values):
+    return values.any(axis=tuple(range(1, values.ndim)))
+
+
+def digit_tensor(cells):
+    # (N, 3, 3, 3, 3, 9): the cell holds digit d + 1
+    return cells[..., None] == np.arange(1, 10, dtype=cells.dtype)
+
+
+def unit_counts(tensor):
+    # Count of each digit in the row, column and block of each cell, shaped
+    # to broadcast back to the cells. Adding slices of the uint8 view is a
+    # few times faster than sum over two axes.
+    values = tensor.view(np.uint8)
+    in_stack = values[:, :, :, :, 0] + values[:, :, :, :, 1] + values[:, :, :, :, 2]
+    rows = in_stack[:, :, :, 0] + in_stack[:, :, :, 1] + in_stack[:, :, :, 2]
+    blocks = in_stack[:, :, 0] + in_stack[:, :, 1] + in_stack[:, :, 2]
+    in_band = values[:, :, 0] + values[:, :, 1] + values[:, :, 2]
+    cols = in_band[:, 0] + in_band[:, 1] + in_band[:, 2]
+    return rows[:, :, :, None, None], cols[:, None, None], blocks[:, :, None, :, None]
+
+
+def propagate_grids(grids) -> Tuple[object, object]:
+    # grids: (N, 9, 9) digits, 0 for empty. Fills naked and hidden singles
+    # of every puzzle at once until none is left. Returns the grids and
+    # the state of each puzzle: INVALID, SOLVED, DEAD (a digit twice in a
+    # unit, or a cell or a digit of a unit with no place left) or OPEN.
+    cells = unit_view(grids.copy())
+    count = len(cells)
+    state = np.full(count, OPEN, dtype=np.int8)
+    invalid = np.zeros(count, dtype=bool)
+    for in_unit in unit_counts(digit_tensor(cells)):
+        invalid |= any_per_puzzle(in_unit > 1)
+    state[invalid] = INVALID
+    # Puzzles that filled a cell last round
+    active = np.flatnonzero(~invalid)
+    while len(active) > 0:
+        current = cells[active]
+        placed = unit_counts(digit_tensor(current))
+        empty = current == 0
+        candidates = empty[..., None] & ((placed[0] | placed[1] | placed[2]) == 0)
+        options = candidates.view(np.uint8).sum(axis=5, dtype=np.uint8)
+        places = unit_counts(candidates)
+
+        # A digit twice in a unit, an empty cell without candidates or a
+        # digit missing from a unit with no place left for it there
+        dead = any_per_puzzle(empty & (options == 0))
+        for in_unit, unit_places in zip(placed, places):
+            dead |= any_per_puzzle(in_unit > 1)
+            dead |= any_per_puzzle((in_unit == 0) & (unit_places == 0))
+
+        hidden = (places[0] == 1) | (places[1] == 1) | (places[2] == 1)
+        singles = candidates & ((options == 1)[..., None] | hidden)
+        # A cell that is the only place of two digits is a dead end
+        found = singles.view(np.uint8).sum(axis=5, dtype=np.uint8)
+        dead |= any_per_puzzle(found > 1)
+        assigned = found > 0
+        progress = any_per_puzzle(assigned) & ~dead
+        solved = ~any_per_puzzle(empty) & ~dead
+        state[active[dead]] = DEAD
+        state[active[solved]] = SOLVED
+
+        digits = singles[progress].argmax(axis=5).astype(cells.dtype) + 1
+        cells[active[progress]] = np.where(
+            assigned[progress], digits, current[progress])
+        # Two singles of one round may put a digit twice in a unit, the
+        # next round finds it
+        active = active[progress]
+    return cells.reshape(count, 9, 9), state
+
+
+def propagate_games(games: List[Game]) -> List[Tuple[int, Game]]:
+    # (state, game with the singles filled) for standard games
+    require_numpy()
+    grids = np.frombuffer(
+        b"".join(bytes(grid_from_puzzle(game.puzzle)) for game in games),
+        dtype=np.uint8).reshape(-1, 9, 9)
+    grids, state = propagate_grids(grids)
+    return [(int(state[i]), Game(grid_to_puzzle(bytearray(grids[i].tobytes())),
+                                 games[i].cages, games[i].rules))
+            for i in range(len(games))]
+
+
+def iter_propagated_items(
+        items: Iterable[Union[BatchItem, Answered]]) -> Iterator[Union[BatchItem, Answered]]:
+    # Standard games are propagated VECTOR_CHUNK at a time in arrays. Those
+    # solved or refuted there are answered with 0 nodes and their share of
+    # the chunk time, givens that break the rules as invalid (as in
+    # solve_batch_item) and the rest are passed on with the singles filled.
+    items = iter(items)
+    while True:
+        chunk = list(itertools.islice(items, VECTOR_CHUNK))
+        if len(chunk) == 0:
+            return
+        bulk = [ix for ix, item in enumerate(chunk)
+                if not isinstance(item, Answered) and item[1] is not None
+                and is_standard_game(item[1])]
+        start_time = time.perf_counter()
+        propagated = {}
+        if len(bulk) > 0:
+            games = [chunk[ix][1] for ix in bulk]
+            propagated = dict(zip(bulk, propagate_games(games)))
+        duration = (time.perf_counter() - start_time) / max(1, len(bulk))
+
+        for ix, item in enumerate(chunk):
+            if isinstance(item, Answered):
+                yield item
+                continue
+            name, game = item
+            state, filled = propagated.get(ix, (OPEN, game))
+            if state == INVALID:
+                yield Answered((name, "invalid", 0, 0.0, GIVENS_ERROR))
+            elif state == SOLVED:
+                line = grid_to_line(grid_from_puzzle(filled.puzzle))
+                yield Answered((name, "solved", 0, duration, line))
+            elif state == DEAD:
+                yield Answered((name, "unsolvable", 0, duration, ""))
+            else:
+                yield name, filled
+
+
+def solve_batch_vectorized(config: SolverConfig,
+                           items: Iterable[Union[BatchItem, Answered]],
+                           workers: int, ordered: bool = True) -> Iterator[BatchResult]:
+    require_numpy()
+    return solve_batch(config, iter_propagated_items(items), workers, ordered)
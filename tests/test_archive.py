@@ -0,0 +1,35 @@
+from pathlib import Path
+
+from sudoku.archive import Archive, ArchiveWriter, is_archive, solutions_path
+from sudoku.helpers import game_from_file
+
+PUZZLES = Path(__file__).parent.parent / "puzzles"
+
+
+def test_archive_round_trip(tmp_path):
+    games = [game_from_file(PUZZLES / name)
+             for name in ["easy.csv", "hard_1.csv", "hard_2.csv"]]
+    path = tmp_path / "puzzles.sdka"
+    with ArchiveWriter(path, ["normal rules"], []) as writer:
+        for game in games:
+            writer.append(game.puzzle)
+    assert is_archive(path)
+    assert not is_archive(tmp_path)
+
+    with Archive(path) as archive:
+        assert len(archive) == len(games)
+        assert [archive.game(index).puzzle for index in range(len(archive))] == \
+            [game.puzzle for game in games]
+        assert archive.rules == ["normal rules"]
+
+
+def test_solutions_line_up_with_their_puzzles(tmp_path):
+    # Records never put read as empty grids
+    path = solutions_path(tmp_path / "puzzles.sdka")
+    solution = game_from_file(PUZZLES / "hard_2_solution.csv").puzzle
+    with ArchiveWriter(path, ["normal rules"], []) as writer:
+        writer.put(2, solution)
+    with Archive(path) as archive:
+        assert len(archive) == 3
+        assert archive.game(2).puzzle == solution
+        assert archive.game(0).puzzle == [[0] * 9 for _ in range(9)]
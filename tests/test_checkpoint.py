@@ -0,0 +1,54 @@
+from pathlib import Path
+
+import pytest
+
+from sudoku.budget import Budget, BudgetExhausted
+from sudoku.checkpoint import Checkpoint, load_checkpoint
+from sudoku.config import SolverConfig, make_solver
+from sudoku.helpers import game_from_file
+from sudoku.logger import Logger
+from sudoku.metrics import Metrics
+
+PUZZLES = Path(__file__).parent.parent / "puzzles"
+
+
+def solve(solve_type, checkpoint=None, resume=None, budget=None):
+    game = game_from_file(PUZZLES / "hard_1.csv")
+    metrics = Metrics()
+    solver = make_solver(SolverConfig(solve_type=solve_type), game, metrics,
+                         Logger(1e10))
+    solver.checkpoint = checkpoint
+    solver.resume = resume
+    solver.budget = budget
+    solvers = {
+        "iterative": solver.solve_iterative,
+        "smart": solver.solve_smart,
+        "iterative_bfs": solver.solve_iterative_bfs,
+    }
+    return solvers[solve_type](game.puzzle), metrics.nodes()
+
+
+@pytest.mark.parametrize("solve_type", ["iterative", "smart", "iterative_bfs"])
+def test_resume_matches_an_uninterrupted_search(solve_type, tmp_path):
+    solution, nodes = solve(solve_type)
+
+    # Saved every CHECKPOINT_CHECK_NODES nodes, stopped past the first save
+    path = tmp_path / "search.checkpoint"
+    checkpoint = Checkpoint(path, 0)
+    with pytest.raises(BudgetExhausted):
+        solve(solve_type, checkpoint, budget=Budget(max_nodes=nodes // 2))
+    assert checkpoint.saved > 0
+
+    resumed = Checkpoint(path, 0)
+    assert solve(solve_type, resumed, resume=load_checkpoint(path)) == \
+        (solution, nodes)
+    # The finished search removes its checkpoint
+    assert not path.exists()
+
+
+def test_resume_rejects_another_search(tmp_path):
+    path = tmp_path / "search.checkpoint"
+    with pytest.raises(BudgetExhausted):
+        solve("iterative", Checkpoint(path, 0), budget=Budget(max_nodes=300))
+    with pytest.raises(ValueError):
+        solve("smart", resume=load_checkpoint(path))
@@ -0,0 +1,42 @@
+from pathlib import Path
+
+import pytest
+
+from sudoku.batch import iter_batch_games
+from sudoku.cli import get_parser
+
+PUZZLES = Path(__file__).parent.parent / "puzzles"
+HARD_1 = "006100008080090030200005400400001800030070040007900003008400006020050080100002500"
+
+
+@pytest.mark.parametrize("argv", [
+    ["solve-batch", "puzzles.txt", "--skip", "-1"],
+    ["solve-batch", "puzzles.txt", "--limit", "0"],
+    ["solve-batch", "puzzles.txt", "--limit", "-1"],
+    ["count-solutions", "puzzles.txt", "--limit", "0"],
+])
+def test_bad_counts_are_usage_errors(argv):
+    with pytest.raises(SystemExit):
+        get_parser().parse_args(argv)
+
+
+@pytest.mark.parametrize("argv, error", [
+    (["--shard", "0/2"], "ERROR: --shard, --skip and --limit"),
+    (["--limit", "1"], "ERROR: --shard, --skip and --limit"),
+    (["--archive-solutions"], "ERROR: --archive-solutions"),
+])
+def test_batch_options_need_the_right_input(argv, error, capsys):
+    # Reported like command_solve does, without starting the workers
+    args = get_parser().parse_args(["solve-batch", str(PUZZLES)] + argv)
+    args.func(args)
+    assert capsys.readouterr().out.startswith(error)
+
+
+def test_skip_and_limit_slice_lines(tmp_path):
+    path = tmp_path / "puzzles.txt"
+    path.write_text((HARD_1 + "\n") * 5)
+    names = [name for name, _game in iter_batch_games(path, skip=1, limit=2)]
+    assert names == [f"{path}:2", f"{path}:3"]
+    names = [name for name, _game in iter_batch_games(path, skip=4, limit=3)]
+    assert names == [f"{path}:5"]
+    assert list(iter_batch_games(path, skip=5)) == []
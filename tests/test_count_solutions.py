@@ -0,0 +1,31 @@
+from pathlib import Path
+
+import pytest
+
+from sudoku.config import SolverConfig, count_solutions
+from sudoku.helpers import game_from_file, puzzle_to_line
+from sudoku.metrics import Metrics
+
+PUZZLES = Path(__file__).parent.parent / "puzzles"
+
+
+@pytest.mark.parametrize("solver_version", ["v1", "dlx"])
+@pytest.mark.parametrize("name, limit, count", [
+    ("easy.csv", 1, 1),
+    ("easy.csv", 2, 2),
+    ("easy.csv", 5, 2),
+    ("hard_1.csv", 2, 1),
+])
+def test_count_solutions_stops_at_the_limit(solver_version, name, limit, count):
+    game = game_from_file(PUZZLES / name)
+    config = SolverConfig(solver_version=solver_version)
+    assert len(count_solutions(config, game, Metrics(), limit)) == count
+
+
+def test_solver_versions_count_the_same_solutions():
+    game = game_from_file(PUZZLES / "easy.csv")
+    found = [sorted(puzzle_to_line(solution) for solution in
+                    count_solutions(SolverConfig(solver_version=version),
+                                    game, Metrics(), 5))
+             for version in ["v1", "dlx"]]
+    assert found[0] == found[1]
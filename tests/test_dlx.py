@@ -0,0 +1,23 @@
+from pathlib import Path
+
+import pytest
+
+from sudoku.config import SolverConfig, solve_game
+from sudoku.dlx import SolverDLX
+from sudoku.helpers import game_from_file
+from sudoku.metrics import Metrics
+
+PUZZLES = Path(__file__).parent.parent / "puzzles"
+
+
+@pytest.mark.parametrize("name", ["hard_1", "hard_2"])
+@pytest.mark.parametrize("config", [
+    SolverConfig(),
+    SolverConfig(next_step="mrv", solve_type="inplace"),
+    SolverConfig(solver_version="v2"),
+])
+def test_solvers_agree_with_dlx(name, config):
+    game = game_from_file(PUZZLES / f"{name}.csv")
+    solution = game_from_file(PUZZLES / f"{name}_solution.csv").puzzle
+    assert SolverDLX(game, Metrics()).solve(game.puzzle) == solution
+    assert solve_game(config, game, Metrics()) == solution
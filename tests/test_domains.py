@@ -0,0 +1,70 @@
+import random
+from pathlib import Path
+
+import pytest
+
+from sudoku.candidates import Candidates, Domains, HashedDomains
+from sudoku.helpers import game_from_file
+from sudoku.transposition import zobrist_domains
+
+PUZZLES = Path(__file__).parent.parent / "puzzles"
+
+
+def assert_same_domains(domains: Domains, fresh: Domains):
+    assert domains.domains == fresh.domains
+    assert domains.placed == fresh.placed
+    assert domains.positions == fresh.positions
+    assert domains.empty == fresh.empty
+    assert domains.missing == fresh.missing
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("name, rules", [
+    ("hard_1.csv", None),
+    ("cages.txt", None),
+    ("cages.txt", ["normal rules", "no consecutive digits in ortogonal adjacent"]),
+])
+def test_place_and_undo_match_a_rebuild(name, rules, seed):
+    # Random assignments and undos to random earlier marks, as the in
+    # place search does, checked against domains built from scratch
+    game = game_from_file(PUZZLES / name)
+    normal = rules is None or "normal rules" in rules
+    cages = game.cages if rules is None else []
+    no_consecutive = "no consecutive digits in ortogonal adjacent" in (rules or game.rules)
+    puzzle = [list(row) for row in game.puzzle]
+    candidates = Candidates(puzzle, normal, cages, no_consecutive, True)
+    candidates.hash_domains()
+    assert isinstance(candidates.domains, HashedDomains)
+
+    rng = random.Random(seed)
+    marks = []
+    for _ in range(400):
+        empty = [(i, j) for i in range(9) for j in range(9) if puzzle[i][j] == 0]
+        options = [(i, j, candidates.digits(i, j)) for i, j in empty]
+        options = [option for option in options if len(option[2]) > 0]
+        if len(options) > 0 and (len(marks) == 0 or rng.random() < 0.7):
+            i, j, digits = rng.choice(options)
+            marks.append(len(candidates.trail))
+            candidates.assign(i, j, rng.choice(digits))
+        elif len(marks) > 0:
+            mark = marks[rng.randrange(len(marks))]
+            del marks[marks.index(mark):]
+            candidates.undo(mark)
+
+        fresh = Domains(candidates)
+        assert_same_domains(candidates.domains, fresh)
+        assert candidates.zobrist() == zobrist_domains(fresh.domains)
+        assert candidates.infeasible() == fresh.infeasible()
+
+    candidates.undo(0)
+    assert puzzle == [list(row) for row in game.puzzle]
+    assert_same_domains(candidates.domains, Domains(candidates))
+
+
+def test_domains_are_built_on_first_read():
+    game = game_from_file(PUZZLES / "hard_1.csv")
+    candidates = Candidates([list(row) for row in game.puzzle], track_domains=True)
+    assert candidates.domains is None
+    assert not candidates.infeasible()
+    assert candidates.domains is not None
+    assert Candidates(game.puzzle).infeasible() is False
@@ -0,0 +1,60 @@
+import random
+from pathlib import Path
+
+import pytest
+
+from sudoku.helpers import game_from_file
+from sudoku.metrics import Metrics
+from sudoku.symmetry import (SolutionCache, apply_transform, canonical_form,
+                             invert_transform)
+from sudoku.types import Game
+
+PUZZLES = Path(__file__).parent.parent / "puzzles"
+
+
+def random_transform(rng: random.Random):
+    # A transform that keeps sudokus valid: bands and stacks swapped,
+    # lines swapped inside them, digits relabeled
+    def lines():
+        blocks = rng.sample(range(3), 3)
+        return tuple(3 * block + line for block in blocks
+                     for line in rng.sample(range(3), 3))
+    digits = (0,) + tuple(rng.sample(range(1, 10), 9))
+    return rng.random() < 0.5, lines(), lines(), digits
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("name", ["easy.csv", "hard_1.csv", "hard_2.csv"])
+def test_canonical_form_ignores_symmetries(name, seed):
+    puzzle = game_from_file(PUZZLES / name).puzzle
+    key, transform = canonical_form(puzzle)
+    copy = apply_transform(puzzle, random_transform(random.Random(seed)))
+    copy_key, copy_transform = canonical_form(copy)
+    assert copy_key == key
+    assert "".join(str(value) for row in apply_transform(copy, copy_transform)
+                   for value in row) == key
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_invert_transform_undoes_it(seed):
+    puzzle = game_from_file(PUZZLES / "hard_1.csv").puzzle
+    transform = random_transform(random.Random(seed))
+    moved = apply_transform(puzzle, transform)
+    assert apply_transform(moved, invert_transform(transform)) == \
+        [list(row) for row in puzzle]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_cached_solution_solves_a_copy(seed):
+    # A copy gets the canonical solution mapped back onto its own grid
+    game = game_from_file(PUZZLES / "hard_1.csv")
+    solution = game_from_file(PUZZLES / "hard_1_solution.csv").puzzle
+    cache = SolutionCache(10)
+    key, transform, cached = cache.get(game, Metrics())
+    assert cached is None
+    cache.put(key, transform, solution)
+
+    moved = random_transform(random.Random(seed))
+    copy = Game(apply_transform(game.puzzle, moved), [], ["normal rules"])
+    _key, _transform, cached = cache.get(copy, Metrics())
+    assert cached == apply_transform(solution, moved)
@@ -0,0 +1,31 @@
+import pytest
+
+from sudoku.batch import iter_batch_games, solve_batch
+from sudoku.config import SolverConfig
+from sudoku.vectorized import solve_batch_vectorized
+
+pytest.importorskip("numpy")
+
+HARD_1 = "006100008080090030200005400400001800030070040007900003008400006020050080100002500"
+HARD_1_SOLUTION = "346127958785694132219385467462531879931278645857946213598413726624759381173862594"
+
+
+def test_vectorized_batch_matches_the_scalar_one(tmp_path):
+    # Solved by propagation, searched, given twice in a row, unsolvable,
+    # unreadable
+    lines = [
+        HARD_1_SOLUTION[:40] + "0" + HARD_1_SOLUTION[41:],
+        HARD_1,
+        "11" + HARD_1[2:],
+        HARD_1[:2] + "5" + HARD_1[3:],
+        "x" * 81,
+    ]
+    path = tmp_path / "puzzles.txt"
+    path.write_text("\n".join(lines) + "\n")
+    config = SolverConfig(next_step="mrv", solve_type="inplace")
+    results = [[(name, status, solution) for name, status, _nodes, _duration, solution
+                in solve(config, iter_batch_games(path), 1)]
+               for solve in [solve_batch, solve_batch_vectorized]]
+    assert results[0] == results[1]
+    assert [status for _name, status, _solution in results[0]] == \
+        ["solved", "solved", "invalid", "unsolvable", "invalid"]